@@ -0,0 +1,183 @@
+# admission.py
+"""
+写接口的准入控制（过载时快速拒绝，而不是排队）。
+
+1. 令牌桶限流：每个客户端（带有 ADMISSION_API_KEYS 中的 X-API-Key 时按 API key，否则按 IP）一个令牌桶，
+   桶的状态保存在一个本地 SQLite 小文件中，同一台机器上的所有 gunicorn worker 共享。
+   每次请求只执行一条 UPSERT ... RETURNING，原子地“补充令牌 + 尝试取一个”。
+   超出速率的请求立即返回 429 和 Retry-After。
+2. 并发上限：每个 worker 同时处理的写请求数有上限，超出时立即返回 503，
+   保证还有线程可以处理读请求，而不是所有线程都阻塞在 SQLite 提交和密码哈希上。
+
+限流存储出错（如文件被锁住）时放行请求，限流器本身不能成为故障点。
+
+按 IP 限流依赖 request.remote_addr：部署在反向代理或负载均衡之后时必须设置 TRUSTED_PROXIES
+（见 app.py 中的 ProxyFix），否则所有用户都会共用代理地址的同一个令牌桶。
+"""
+import hashlib
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import wraps
+
+from flask import Response, jsonify, request
+
+# 需要准入控制的请求方法（GET 等只读请求不受影响）
+WRITE_METHODS = frozenset(['POST', 'PUT', 'PATCH', 'DELETE'])
+
+BUCKET_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS token_bucket (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    admitted INTEGER NOT NULL
+) WITHOUT ROWID
+'''
+
+# SET 中的表达式使用的都是更新前的值：先按经过的时间补充令牌（不超过容量），够一个就取走
+TAKE_TOKEN_SQL = '''
+INSERT INTO token_bucket (key, tokens, updated, admitted) VALUES (:key, :capacity - 1, :now, 1)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = min(:capacity, tokens + (:now - updated) * :rate)
+             - (min(:capacity, tokens + (:now - updated) * :rate) >= 1),
+    admitted = min(:capacity, tokens + (:now - updated) * :rate) >= 1,
+    updated = :now
+RETURNING admitted, tokens
+'''
+
+
+class TokenBuckets:
+    """保存在 SQLite 文件中的令牌桶，可以在多个进程之间共享"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # 自动提交；等锁最多 50ms，限流状态丢失也无所谓，所以不需要 fsync
+            conn = sqlite3.connect(self.path, timeout=0.05, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(BUCKET_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, capacity):
+        """取一个令牌：返回 (是否放行, 需要等待的秒数)"""
+        conn = self._connection()
+        now = time.time()
+        admitted, tokens = conn.execute(
+            TAKE_TOKEN_SQL, {'key': key, 'rate': rate, 'capacity': capacity, 'now': now}
+        ).fetchone()
+        self._calls += 1
+        if self._calls % 1000 == 0:
+            # 闲置到已经补满的桶和不存在没有区别，定期删掉，表不会无限增长
+            conn.execute('DELETE FROM token_bucket WHERE updated < ?', (now - capacity / rate,))
+        if admitted:
+            return True, 0
+        return False, (1 - tokens) / rate
+
+
+class AdmissionController:
+    def __init__(self):
+        self.enabled = False
+        self.buckets = None
+        self.max_writes = 0
+        self._write_slots = None
+        self._lock = threading.Lock()
+        self._counters = {
+            'admitted': 0,
+            'shed_rate_limited': 0,
+            'shed_concurrency': 0,
+            'limiter_errors': 0,
+        }
+        self._in_flight = 0
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config['ADMISSION_ENABLED']
+        self.rate = config['ADMISSION_RATE']
+        self.burst = config['ADMISSION_BURST']
+        self.api_key_rate = config['ADMISSION_API_KEY_RATE']
+        self.api_key_burst = config['ADMISSION_API_KEY_BURST']
+        # 只保存哈希值，和令牌桶中的 key 一致
+        self.api_keys = frozenset(_digest(key) for key in config['ADMISSION_API_KEYS'])
+        path = config['ADMISSION_DB'] or os.path.join(tempfile.gettempdir(), 'submission-admission.db')
+        self.buckets = TokenBuckets(path)
+        self.max_writes = config['ADMISSION_MAX_CONCURRENT_WRITES']
+        self._write_slots = threading.BoundedSemaphore(self.max_writes)
+        app.extensions['admission'] = self
+
+    def client_key(self):
+        """
+        限流的维度：配置过的 API key 按 key（只保存哈希值），使用合作方的额度；
+        没有 key 或 key 不在 ADMISSION_API_KEYS 中时按客户端 IP，随意编造的 key 不能绕过限流。
+        """
+        api_key = request.headers.get('X-API-Key')
+        if api_key:
+            digest = _digest(api_key)
+            if digest in self.api_keys:
+                return f'key:{digest}', self.api_key_rate, self.api_key_burst
+        return f'ip:{request.remote_addr}', self.rate, self.burst
+
+    def limit_writes(self, view):
+        """视图装饰器：写请求先经过令牌桶和并发上限，任何一个不满足都立即拒绝"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not self.enabled or request.method not in WRITE_METHODS:
+                return view(*args, **kwargs)
+
+            key, rate, burst = self.client_key()
+            try:
+                admitted, wait = self.buckets.take(key, rate, burst)
+            except sqlite3.Error:
+                self._count('limiter_errors')
+                admitted, wait = True, 0
+            if not admitted:
+                self._count('shed_rate_limited')
+                return self._reject(429, '请求过于频繁，请稍后再试', wait)
+
+            if not self._write_slots.acquire(blocking=False):
+                self._count('shed_concurrency')
+                return self._reject(503, '服务器繁忙，请稍后再试', 1)
+            self._count('admitted', in_flight=1)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                self._write_slots.release()
+        return wrapper
+
+    def _count(self, name, in_flight=0):
+        with self._lock:
+            self._counters[name] += 1
+            self._in_flight += in_flight
+
+    def _reject(self, status, message, wait):
+        """API 请求返回 JSON，表单页面返回纯文本；都带 Retry-After（整数秒）"""
+        retry_after = max(1, math.ceil(wait))
+        if request.path.startswith('/api/') or request.is_json:
+            response = jsonify({'status': 'error', 'message': message, 'retry_after': retry_after})
+            response.status_code = status
+        else:
+            response = Response(f'{message}（{retry_after} 秒后）', status, mimetype='text/plain')
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, in_flight_writes=self._in_flight, max_concurrent_writes=self.max_writes)
+
+
+def _digest(api_key):
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:32]
+
+
+admission = AdmissionController()
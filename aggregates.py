@@ -0,0 +1,150 @@
+# aggregates.py
+"""
+提交记录的派生数据（用户提交计数、按日统计汇总、表版本号、变更日志）维护。
+
+所有新增/删除提交记录的路径都要在同一个事务里调用 apply_submission_changes：
+- ORM 路径（session.add / session.delete）由下面的 mapper 事件自动调用
+- Core 批量路径（executemany）需要显式调用；批量删除和归档使用 delete_submissions
+"""
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import and_, bindparam, delete, event, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import User, ContactSubmission, SubmissionChange, SubmissionDailyStat, TableVersion
+
+
+def _get(row, key):
+    """记录既可能是 ORM 对象，也可能是字典（Core 批量写入时的参数）"""
+    return row[key] if isinstance(row, dict) else getattr(row, key)
+
+
+def apply_submission_changes(connection, added=(), removed=(), archived=()):
+    """
+    在 connection 当前的事务中，根据新增和删除的记录更新派生数据。
+    archived 是移到归档表的记录：和删除一样从用户计数和列表中消失，但按日统计保留（历史统计不变）。
+    """
+    user_deltas = Counter()
+    stat_deltas = Counter()
+    for sign, rows, in_stats in ((1, added, True), (-1, removed, True), (-1, archived, False)):
+        for row in rows:
+            if _get(row, 'user_id') is not None:
+                user_deltas[_get(row, 'user_id')] += sign
+            # 没有提交时间的旧记录不属于任何一天，回填统计时也不计入（见 migrations._backfill_daily_stats）
+            if in_stats and _get(row, 'submitted_at') is not None:
+                stat_deltas[_stat_key(row)] += sign
+    _update_user_counts(connection, user_deltas)
+    _update_daily_stats(connection, stat_deltas)
+    if added or removed or archived:
+        _record_changes(connection, added, [*removed, *archived])
+        bump_table_version(connection, ContactSubmission.__tablename__)
+
+
+def delete_submissions(connection, condition, archived=False):
+    """
+    用一条 DELETE ... WHERE condition 删除记录，并在同一事务中更新派生数据，返回被删除的行。
+    全文搜索索引由数据库触发器同步。archived=True 表示记录已复制到归档表（按日统计保留）。
+    """
+    table = ContactSubmission.__table__
+    columns = (table.c.id, table.c.user_id, table.c.category, table.c.subscribe, table.c.submitted_at)
+    if connection.dialect.delete_returning:
+        removed = connection.execute(delete(table).where(condition).returning(*columns)).all()
+    else:
+        removed = connection.execute(select(*columns).where(condition).with_for_update()).all()
+        connection.execute(delete(table).where(condition))
+    if archived:
+        apply_submission_changes(connection, archived=removed)
+    else:
+        apply_submission_changes(connection, removed=removed)
+    return removed
+
+
+def _record_changes(connection, added, removed):
+    """追加变更日志（记录必须已经有 ID），供 /api/submissions/changes 增量读取"""
+    now = datetime.utcnow()
+    params = [
+        {'op': op, 'submission_id': _get(row, 'id'), 'user_id': _get(row, 'user_id'), 'changed_at': now}
+        for op, rows in (('insert', added), ('delete', removed))
+        for row in rows
+    ]
+    connection.execute(insert(SubmissionChange.__table__), params)
+
+
+def bump_table_version(connection, name):
+    """表版本号加一（HTTP 缓存据此判断数据是否变化）"""
+    table = TableVersion.__table__
+    now = datetime.utcnow()
+    result = connection.execute(
+        update(table).where(table.c.name == name)
+        .values(version=table.c.version + 1, changed_at=now)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(name=name, version=1, changed_at=now))
+
+
+def _stat_key(row):
+    """统计汇总表的主键：(日期, 类型, 是否订阅)"""
+    return (
+        _get(row, 'submitted_at').date(),
+        _get(row, 'category') or 'general',
+        bool(_get(row, 'subscribe')),
+    )
+
+
+def _update_user_counts(connection, deltas):
+    """User.submission_count += delta，用一次 executemany 更新所有用户"""
+    params = [{'uid': uid, 'delta': delta} for uid, delta in deltas.items() if delta]
+    if not params:
+        return
+    stmt = (
+        update(User.__table__)
+        .where(User.__table__.c.id == bindparam('uid'))
+        .values(submission_count=User.__table__.c.submission_count + bindparam('delta'))
+    )
+    connection.execute(stmt, params)
+
+
+def _update_daily_stats(connection, deltas):
+    """SubmissionDailyStat.count += delta，行不存在时插入（upsert）"""
+    params = [
+        {'day': day, 'category': category, 'subscribe': subscribe, 'count': delta}
+        for (day, category, subscribe), delta in deltas.items() if delta
+    ]
+    if not params:
+        return
+    table = SubmissionDailyStat.__table__
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        dialect_insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.category, table.c.subscribe],
+            set_={'count': table.c.count + stmt.excluded.count},
+        )
+        connection.execute(stmt, params)
+        return
+    # 其他数据库：先尝试更新，没有对应行再插入
+    stmt = (
+        update(table)
+        .where(and_(
+            table.c.day == bindparam('b_day'),
+            table.c.category == bindparam('b_category'),
+            table.c.subscribe == bindparam('b_subscribe'),
+        ))
+        .values(count=table.c.count + bindparam('b_count'))
+    )
+    for param in params:
+        result = connection.execute(stmt, {f'b_{key}': value for key, value in param.items()})
+        if result.rowcount == 0:
+            connection.execute(insert(table), param)
+
+
+@event.listens_for(ContactSubmission, 'after_insert')
+def _submission_inserted(mapper, connection, target):
+    apply_submission_changes(connection, added=[target])
+
+
+@event.listens_for(ContactSubmission, 'after_delete')
+def _submission_deleted(mapper, connection, target):
+    apply_submission_changes(connection, removed=[target])
@@ -1,40 +1,240 @@
 # 在 app.py 顶部附近，其他导入语句旁边
-from models import db, User, ContactSubmission
-from flask import Flask, render_template, request, flash, redirect, url_for, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from models import db, User, ContactSubmission, SubmissionDailyStat
+from flask import (Flask, Blueprint, current_app, render_template, request, flash, redirect,
+                   url_for, jsonify, Response, stream_with_context)
+from sqlalchemy import and_, or_, func, insert, select
+from datetime import datetime, date, timedelta
 from forms import ContactForm, LoginForm, RegistrationForm
+from write_behind import WriteBehindQueue
+from user_cache import UserCache, install_invalidation
+from password_hashing import password_hasher, HashingBusyError
+from aggregates import apply_submission_changes, delete_submissions
+from migrations import upgrade_schema
+import retention
+import search
+import changes
+from http_cache import ResponseCache, cached_page, conditional_on_table
+from assets import Assets, build_assets
+from metrics import metrics
+from admission import admission
+from storage import storage, read_only
+from serializers import SUBMISSION_COLUMNS, encode_submission_row, json_response_with_rows
 import os
+import base64
+import binascii
+import io
+import json
+import time
+import click
 from flask_login import LoginManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_login import login_user, logout_user, current_user, login_required
 
-app = Flask(__name__)
-
-app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'  # 必须设置，用于flash消息加密
-# 配置SQLite数据库URI。///是相对路径，db文件将位于项目根目录。
 basedir = os.path.abspath(os.path.dirname(__file__)) # 获取当前文件所在目录的绝对路径
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'site.db')
-# 这样无论项目在哪个服务器、哪个目录下，都能正确定位到 site.db 文件
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-# 1. 初始化扩展
-db.init_app(app)  # 注意：因为我们改用了 models.py 中的 db，这里需要用 init_app
-login_manager = LoginManager()  # 2. 创建 LoginManager 实例
-login_manager.init_app(app)     # 3. 将其与app关联
+# 扩展对象先创建，在 create_app() 里再和具体的 app 关联（与 models.py 中的 db 相同）
+login_manager = LoginManager()
+user_cache = UserCache()
+install_invalidation(user_cache)
+page_cache = ResponseCache()
+assets = Assets()
+
+# 所有页面和接口都注册在这个蓝图上；cli_group=None 让命令保持为 flask upgrade-db 这样的形式
+main = Blueprint('main', __name__, cli_group=None)
+
+
+def load_config(app):
+    """从环境变量读取配置"""
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')  # 必须设置，用于flash消息加密
+    # 配置SQLite数据库URI。///是相对路径，db文件将位于项目根目录。
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'site.db'))
+    # 这样无论项目在哪个服务器、哪个目录下，都能正确定位到 site.db 文件（设置 DATABASE_URL 可以换成其他数据库，如压测用的库）
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # 数据库存储方案（见 storage.py）：
+    #   DATABASE_PROFILE=wal 为 SQLite 启用 WAL 等参数；=default 保持 SQLite 默认设置
+    #   DATABASE_READ_URL 只读视图使用的数据库（如只读副本），默认与 DATABASE_URL 相同
+    app.config['DATABASE_PROFILE'] = os.environ.get('DATABASE_PROFILE', 'wal')
+    app.config['DATABASE_READ_URL'] = os.environ.get('DATABASE_READ_URL')
+    app.config['DATABASE_POOL_SIZE'] = int(os.environ.get('DATABASE_POOL_SIZE', 5))
+    app.config['DATABASE_MAX_OVERFLOW'] = int(os.environ.get('DATABASE_MAX_OVERFLOW', 5))
+    app.config['DATABASE_POOL_TIMEOUT'] = float(os.environ.get('DATABASE_POOL_TIMEOUT', 10))
+    app.config['DATABASE_POOL_RECYCLE'] = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    app.config['SQLITE_CACHE_SIZE_KB'] = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+
+    # 写后缓冲（可选）：提交记录先放进进程内队列，由后台线程合并提交
+    #   SUBMISSION_DURABILITY=fsync 写入数据库后才返回；=ack 放入队列后立即返回
+    app.config['SUBMISSION_WRITE_BEHIND'] = os.environ.get('SUBMISSION_WRITE_BEHIND', 'false').lower() == 'true'
+    app.config['SUBMISSION_DURABILITY'] = os.environ.get('SUBMISSION_DURABILITY', 'fsync')
+    app.config['SUBMISSION_FLUSH_INTERVAL_MS'] = int(os.environ.get('SUBMISSION_FLUSH_INTERVAL_MS', 50))
+    app.config['SUBMISSION_FLUSH_MAX_ROWS'] = int(os.environ.get('SUBMISSION_FLUSH_MAX_ROWS', 200))
+
+    # 密码哈希：在有界进程池中计算，避免 scrypt 阻塞 worker
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    app.config['PASSWORD_HASH_TARGET_MS'] = int(os.environ.get('PASSWORD_HASH_TARGET_MS', 0))
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    app.config['PASSWORD_HASH_CONCURRENCY'] = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', 2))
+    app.config['PASSWORD_HASH_QUEUE_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5))
+
+    # 用户缓存：每个 worker 进程内缓存用户快照，避免每个请求都查询一次 user 表
+    app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 300))
+
+    # 匿名页面缓存：首页、关于页等渲染结果在每个 worker 内缓存几秒
+    app.config['PAGE_CACHE_SIZE'] = int(os.environ.get('PAGE_CACHE_SIZE', 128))
+    app.config['PAGE_CACHE_TTL'] = int(os.environ.get('PAGE_CACHE_TTL', 10))
+
+    # 性能指标：/metrics 输出 Prometheus 格式；多个 gunicorn worker 通过 METRICS_DIR 汇总
+    #          （gunicorn.conf.py 在没有配置时会为每次启动创建一个临时目录）
+    #          SLOW_REQUEST_MS 设置后，超过该耗时的请求会记录 SQL 明细
+    app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR')
+    app.config['SLOW_REQUEST_MS'] = int(os.environ.get('SLOW_REQUEST_MS', 0)) or None
+    app.config['N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10))
+
+    # 增量变更：长轮询最长等待时间、SSE 单个连接的最长时间（之后浏览器自动重连）、检查新变更的间隔
+    app.config['CHANGES_LONG_POLL_TIMEOUT'] = int(os.environ.get('CHANGES_LONG_POLL_TIMEOUT', 25))
+    app.config['CHANGES_STREAM_SECONDS'] = int(os.environ.get('CHANGES_STREAM_SECONDS', 300))
+    app.config['CHANGES_POLL_INTERVAL_MS'] = int(os.environ.get('CHANGES_POLL_INTERVAL_MS', 500))
+    #   每个 worker 同时挂起的 SSE/长轮询请求数上限（应明显小于 GUNICORN_THREADS），
+    #   超出时让页面每 CHANGES_BUSY_RETRY_SECONDS 秒来取一次
+    app.config['CHANGES_MAX_WAITERS'] = int(os.environ.get('CHANGES_MAX_WAITERS', 4))
+    app.config['CHANGES_BUSY_RETRY_SECONDS'] = int(os.environ.get('CHANGES_BUSY_RETRY_SECONDS', 10))
+
+    # 保留策略（flask archive-submissions）：超过保留天数的记录移到归档表；
+    #   SUBMISSION_ARCHIVE_DB 设置后归档到单独的 SQLite 文件；变更日志只保留最近若干小时
+    app.config['SUBMISSION_RETENTION_DAYS'] = int(os.environ.get('SUBMISSION_RETENTION_DAYS', 365))
+    app.config['SUBMISSION_ARCHIVE_DB'] = os.environ.get('SUBMISSION_ARCHIVE_DB')
+    app.config['CHANGES_RETENTION_HOURS'] = int(os.environ.get('CHANGES_RETENTION_HOURS', 24))
+
+    # 写接口准入控制（见 admission.py）：每个客户端/IP 每秒 ADMISSION_RATE 个写请求，允许突发 ADMISSION_BURST 个；
+    #   X-API-Key 在 ADMISSION_API_KEYS（逗号分隔）中的合作方使用单独的额度，其他 key 按 IP 限流；
+    #   每个 worker 同时处理的写请求不超过 ADMISSION_MAX_CONCURRENT_WRITES
+    #   ADMISSION_DB 是各 worker 共享的令牌桶文件（默认在系统临时目录）
+    app.config['ADMISSION_ENABLED'] = os.environ.get('ADMISSION_ENABLED', 'true').lower() == 'true'
+    app.config['ADMISSION_RATE'] = float(os.environ.get('ADMISSION_RATE', 5))
+    app.config['ADMISSION_BURST'] = float(os.environ.get('ADMISSION_BURST', 20))
+    app.config['ADMISSION_API_KEY_RATE'] = float(os.environ.get('ADMISSION_API_KEY_RATE', 50))
+    app.config['ADMISSION_API_KEY_BURST'] = float(os.environ.get('ADMISSION_API_KEY_BURST', 200))
+    app.config['ADMISSION_API_KEYS'] = [key.strip() for key in os.environ.get('ADMISSION_API_KEYS', '').split(',')
+                                        if key.strip()]
+    app.config['ADMISSION_MAX_CONCURRENT_WRITES'] = int(os.environ.get('ADMISSION_MAX_CONCURRENT_WRITES', 4))
+    app.config['ADMISSION_DB'] = os.environ.get('ADMISSION_DB')
+    # 部署在反向代理/负载均衡之后时设置为代理的层数，才能从 X-Forwarded-For 等请求头得到真实的客户端 IP
+    # （按 IP 限流依赖它）；直接对外提供服务时保持 0，否则客户端可以伪造这些请求头
+    app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', 0))
+
+    # 静态资源：较大的 HTML/JSON 响应自动 gzip
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+
+
+def create_app(config=None):
+    """
+    应用工厂：创建并配置 Flask 应用。
+    这里不做任何数据库结构相关的操作（请使用 flask --app app upgrade-db），
+    也不建立数据库连接，因此可以在 gunicorn --preload 的主进程中提前加载。
+    config 中的配置会覆盖环境变量的配置（测试、压测时使用）。
+    """
+    app = Flask(__name__)
+    load_config(app)
+    if config:
+        app.config.update(config)
+    proxies = app.config['TRUSTED_PROXIES']
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
+
+    # 1. 初始化扩展
+    storage.init_app(app, db)  # 设置连接参数和只读连接池，并调用 db.init_app(app)
+    login_manager.init_app(app)
+    login_manager.login_view = 'main.login'
+    login_manager.login_message = '请先登录以访问此页面。'
+    login_manager.login_message_category = 'info'
+    password_hasher.init_app(app)
+    admission.init_app(app)
+    changes.waiters.configure(app.config['CHANGES_MAX_WAITERS'])
+    user_cache.configure(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+    page_cache.configure(app.config['PAGE_CACHE_SIZE'], app.config['PAGE_CACHE_TTL'])
+
+    # 2. 写后缓冲队列（可选）
+    if app.config['SUBMISSION_WRITE_BEHIND']:
+        app.extensions['submission_writer'] = WriteBehindQueue(
+            app, ContactSubmission,
+            flush_interval_ms=app.config['SUBMISSION_FLUSH_INTERVAL_MS'],
+            max_batch=app.config['SUBMISSION_FLUSH_MAX_ROWS'],
+            durability=app.config['SUBMISSION_DURABILITY'],
+            on_flush=lambda connection, rows: apply_submission_changes(connection, added=rows),
+        )
+
+    # 3. 性能指标（要在 assets 之前注册，这样记录的是压缩后的响应大小）
+    metrics.init_app(app)
+    metrics.add_collector('user_cache', user_cache.stats)
+    metrics.add_collector('page_cache', page_cache.stats)
+    metrics.add_collector('password_hasher', password_hasher.stats)
+    metrics.add_collector('admission', admission.stats)
+    metrics.add_collector('changes', changes.waiters.stats)
+    metrics.add_collector('db_pool', lambda: storage.pool_stats(db))
+    writer = app.extensions.get('submission_writer')
+    if writer is not None:
+        metrics.add_collector('write_behind', lambda: {
+            'queue_depth': writer.depth,
+            'flushed_rows': writer.flushed_rows,
+            'flushed_batches': writer.flushed_batches,
+            'failed_rows': writer.failed_rows,
+        })
+
+    # 4. 静态资源：带哈希的文件名 + 预压缩 + 长期缓存
+    assets.init_app(app)
+
+    # 5. 注册页面和接口
+    app.register_blueprint(main)
+    return app
+
+
+def get_submission_writer():
+    """当前应用的写后缓冲队列，未启用时返回 None"""
+    return current_app.extensions.get('submission_writer')
+
+
+def save_submission(submission):
+    """
+    保存一条提交记录。
+    启用写后缓冲时，记录交给 submission_writer 异步合并提交，
+    ID 和提交时间在入队前就已确定，调用方可以照常使用。
+    """
+    submission_writer = get_submission_writer()
+    if submission_writer is None:
+        db.session.add(submission)
+        db.session.commit()
+        return submission
+
+    if submission.submitted_at is None:
+        submission.submitted_at = datetime.utcnow()
+    values = {}
+    for column in ContactSubmission.__table__.columns:
+        value = getattr(submission, column.name)
+        # 没有赋值的字段使用列上定义的默认值（如 category='general'）
+        if value is None and column.default is not None and column.default.is_scalar:
+            value = column.default.arg
+        values[column.name] = value
+    submission.id = submission_writer.submit(values)
+    return submission
+
+
+def current_user_key():
+    """ETag 的一部分：不同用户看到的数据不同（如 mine=1）"""
+    return current_user.id if current_user.is_authenticated else 'anonymous'
 
-# 4. 配置 LoginManager
-login_manager.login_view = 'login'
-login_manager.login_message = '请先登录以访问此页面。'
-login_manager.login_message_category = 'info'
 
 @login_manager.user_loader
 def load_user(user_id):
     """必需的：告诉 Flask-Login 如何根据ID加载用户"""
-    # 因为此时已导入 User 模型，可以直接使用
-    return User.query.get(int(user_id))
+    # 返回的是缓存中的 CachedUser 快照，需要 ORM 对象时请用 current_user.id 查询
+    return user_cache.get(int(user_id))
 
 
-@app.route('/')
+@main.route('/')
+@cached_page(page_cache)
 def home():
     template_data = {
         'page_title': '欢迎来到学习之旅！',
@@ -44,7 +244,8 @@ def home():
     # 渲染继承自 base.html 的 index.html
     return render_template('index.html', **template_data)
 
-@app.route('/about')
+@main.route('/about')
+@cached_page(page_cache)
 def about():
     about_data = {
         'page_title': '关于这个网站',
@@ -55,7 +256,8 @@ def about():
     return render_template('about.html', **about_data)
 
 # 替换原来的 @app.route('/contact', methods=['GET', 'POST']) 及其下方的整个函数
-@app.route('/contact', methods=['GET', 'POST'])
+@main.route('/contact', methods=['GET', 'POST'])
+@admission.limit_writes
 def contact():
     # 1. 创建表单实例
     form = ContactForm()
@@ -76,14 +278,13 @@ def contact():
             new_submission.user_id = current_user.id
         
         # 4. 保存到数据库
-        db.session.add(new_submission)
-        db.session.commit()
+        save_submission(new_submission)
         
         # 5. 成功提示
         flash(f'✅ 感谢 {form.name.data}！您的咨询 (#{new_submission.id}) 已收到。', 'success')
         
         # 6. 重定向到记录页面（防止刷新浏览器导致重复提交）
-        return redirect(url_for('submissions'))
+        return redirect(url_for('main.submissions'))
     
     # 7. 如果是GET请求，或者表单验证失败，则渲染页面
     #    此时，form对象会自带用户上次输入的数据和错误信息
@@ -95,18 +296,23 @@ def contact():
     }
     return render_template('contact_wtf.html', **page_data)
 
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
+@admission.limit_writes
 def register():
     # 如果用户已登录，则重定向到首页
     if current_user.is_authenticated:
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     
     form = RegistrationForm()
     if form.validate_on_submit():
         # 1. 创建新用户对象
         user = User(username=form.username.data, email=form.email.data)
         # 2. 使用我们定义的 set_password 方法设置哈希后的密码
-        user.set_password(form.password.data)
+        try:
+            user.set_password(form.password.data)
+        except HashingBusyError as exc:
+            flash(f'⚠️ {exc}', 'danger')
+            return render_template('register.html', page_title='用户注册', form=form), 503
         # 3. 保存到数据库
         db.session.add(user)
         db.session.commit()
@@ -114,7 +320,7 @@ def register():
         flash(f'🎉 恭喜，{user.username}！您的账户已成功创建。', 'success')
         # 4. 注册后自动登录
         login_user(user)
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     
     page_data = {
         'page_title': '用户注册',
@@ -122,19 +328,32 @@ def register():
     }
     return render_template('register.html', **page_data)
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
+@admission.limit_writes
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     
     form = LoginForm()
     if form.validate_on_submit():
         # 1. 通过邮箱查找用户
         user = User.query.filter_by(email=form.email.data).first()
         # 2. 检查用户是否存在且密码正确
-        if user is None or not user.check_password(form.password.data):
+        try:
+            password_ok = user is not None and user.check_password(form.password.data)
+        except HashingBusyError as exc:
+            flash(f'⚠️ {exc}', 'danger')
+            return render_template('login.html', page_title='用户登录', form=form), 503
+        if not password_ok:
             flash('⚠️ 邮箱或密码无效，请重试。', 'danger')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
+        # 哈希参数调整过的话，趁登录成功（此时有明文密码）用新参数重新哈希
+        if user.password_needs_rehash():
+            try:
+                user.set_password(form.password.data)
+                db.session.commit()
+            except HashingBusyError:
+                pass  # 下次登录再重新哈希
         # 3. 登录用户，并可选地“记住”登录状态
         login_user(user, remember=form.remember_me.data)
         flash(f'👋 欢迎回来，{user.username}！', 'success')
@@ -143,7 +362,7 @@ def login():
         # 安全检查：确保 next_page 是本站点内部的 URL（防止开放重定向）
         if next_page and next_page.startswith('/'):
             return redirect(next_page)
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     
     page_data = {
         'page_title': '用户登录',
@@ -151,31 +370,37 @@ def login():
     }
     return render_template('login.html', **page_data)
 
-@app.route('/logout')
+@main.route('/logout')
 def logout():
     logout_user()
     flash('👋 您已成功退出登录。', 'info')
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
+
 
+def get_submission_count(user_id):
+    """读取 User.submission_count（用户快照里的值可能已过期，所以单独查询这一列）"""
+    return db.session.query(User.submission_count).filter_by(id=user_id).scalar() or 0
 
-@app.route('/submissions')
+
+@main.route('/submissions')
 @login_required  # 保护此页面，只有登录用户能看
+@read_only
 def submissions():
     """
     显示当前登录用户的所有提交记录
     """
-    # 通过 user_id 查询属于当前用户的所有提交记录，按时间倒序排列
-    user_submissions = ContactSubmission.query.filter_by(user_id=current_user.id).order_by(ContactSubmission.submitted_at.desc()).all()
+    # 列表由页面通过 /api/submissions 分页加载，这里只需要读取计数
+    submission_count = get_submission_count(current_user.id)
     
     submissions_data = {
         'page_title': '我的提交记录',
-        'dynamic_message': f'你共有 {len(user_submissions)} 条记录。',
+        'dynamic_message': f'你共有 {submission_count} 条记录。',
         'current_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'submissions': user_submissions  # 传递过滤后的记录
     }
     return render_template('submissions.html', **submissions_data)
 
-@app.route('/submission/<int:id>/delete', methods=['POST'])
+@main.route('/submission/<int:id>/delete', methods=['POST'])
+@admission.limit_writes
 def delete_submission(id):
     """
     删除指定ID的记录（仅允许记录所有者删除）
@@ -187,12 +412,12 @@ def delete_submission(id):
     # 2. 如果没找到，给用户一个错误提示
     if not submission_to_delete:
         flash('未找到要删除的记录！', 'error')
-        return redirect(url_for('submissions'))
+        return redirect(url_for('main.submissions'))
     
     # 3. 权限检查：仅允许记录所有者删除自己的记录
     if submission_to_delete.user_id != current_user.id:
         flash('⚠️ 您无权删除他人的记录！', 'danger')
-        return redirect(url_for('submissions'))
+        return redirect(url_for('main.submissions'))
     
     # 4. 找到后，执行删除
     db.session.delete(submission_to_delete)
@@ -202,36 +427,435 @@ def delete_submission(id):
     flash(f'记录 #{id} 已被成功删除。', 'success')
     
     # 6. 重定向回记录列表页
-    return redirect(url_for('submissions'))
+    return redirect(url_for('main.submissions'))
+
+# 分页参数：每页默认条数和允许的最大条数
+SUBMISSIONS_PAGE_SIZE = 50
+SUBMISSIONS_MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(submitted_at, submission_id):
+    """把 (submitted_at, id) 编码成不透明的游标字符串，交给客户端请求下一页"""
+    raw = f'{submitted_at.isoformat()}|{submission_id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """解析游标，格式不正确时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        submitted_at, submission_id = raw.split('|', 1)
+        return datetime.fromisoformat(submitted_at), int(submission_id)
+    except (UnicodeError, ValueError, binascii.Error) as exc:
+        raise ValueError(f'无效的游标: {cursor}') from exc
+
+
+def paginate_submissions(stmt, cursor=None, limit=SUBMISSIONS_PAGE_SIZE):
+    """
+    基于 (submitted_at, id) 的游标分页（keyset pagination）。
+    不使用 OFFSET，每一页的代价只和 limit 有关，与表的总行数无关。
+    stmt 是只选择列的 select()（必须包含 submitted_at 和 id），返回的是行元组而不是 ORM 对象。
+    submitted_at 为 NULL 的旧记录无法用游标定位，不出现在分页列表中。
+    返回 (本页记录列表, 下一页游标或 None)
+    """
+    stmt = stmt.where(ContactSubmission.submitted_at.isnot(None)).order_by(
+        ContactSubmission.submitted_at.desc(), ContactSubmission.id.desc())
+    if cursor:
+        cursor_at, cursor_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            ContactSubmission.submitted_at < cursor_at,
+            and_(ContactSubmission.submitted_at == cursor_at, ContactSubmission.id < cursor_id)
+        ))
+    # 多取一条，用来判断是否还有下一页
+    rows = db.session.execute(stmt.limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.submitted_at, last.id)
+    return rows, next_cursor
+
+
+def count_submissions(mode):
+    """
+    统计记录总数。
+    mode='exact'    精确统计（COUNT(*)，需要扫描索引）
+    mode='estimate' 估算值（MAX(id)，走主键只需一次查找）
+    """
+    if mode == 'exact':
+        return db.session.query(func.count(ContactSubmission.id)).scalar()
+    return db.session.query(func.max(ContactSubmission.id)).scalar() or 0
+
 
-# API 路由：获取所有提交记录
-@app.route('/api/submissions', methods=['GET'])
+# API 路由：分页获取提交记录
+@main.route('/api/submissions', methods=['GET'])
+@read_only
+@conditional_on_table('contact_submission', current_user_key)
 def api_get_submissions():
     """
-    GET /api/submissions
-    返回所有提交记录的JSON列表。
-    用于让其他程序读取数据。
+    GET /api/submissions?limit=50&cursor=<游标>&count=exact|estimate&mine=1
+    按提交时间倒序分页返回提交记录的JSON列表。
+    响应中的 next_cursor 用于请求下一页，为 null 表示已经是最后一页。
+    mine=1 时只返回当前登录用户的记录（走 (user_id, submitted_at) 索引）。
+    支持 If-None-Match/If-Modified-Since：数据没有变化时返回 304，不执行查询。
     """
-    # 1. 从数据库查询所有记录（和之前一样）
-    all_submissions = ContactSubmission.query.order_by(ContactSubmission.submitted_at.desc()).all()
-    
-    # 2. 将每条记录转换成字典，组成一个列表
-    #    这里我们复用之前在 ContactSubmission 模型中定义的 to_dict() 方法
-    submissions_list = [sub.to_dict() for sub in all_submissions]
-    
-    # 3. 构建一个更完整的JSON响应
+    # 1. 解析分页参数
+    limit = request.args.get('limit', SUBMISSIONS_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, SUBMISSIONS_MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor')
+    count_mode = request.args.get('count')
+    if count_mode not in (None, 'exact', 'estimate'):
+        return jsonify({
+            'status': 'error',
+            'message': 'count 参数只能是 exact 或 estimate'
+        }), 400
+
+    # 只查询需要的列，得到行元组，不创建 ORM 对象
+    stmt = select(*SUBMISSION_COLUMNS)
+    # 第一页同时返回变更游标，页面据此订阅之后的增量变更。
+    # 先读游标再查列表：两者之间写入的记录会在变更中再出现一次（页面按 ID 去重），但不会遗漏
+    changes_cursor = None if cursor else changes.high_water_mark()
+    mine = request.args.get('mine') == '1'
+    if mine:
+        if not current_user.is_authenticated:
+            return jsonify({
+                'status': 'error',
+                'message': '请先登录'
+            }), 401
+        stmt = stmt.where(ContactSubmission.user_id == current_user.id)
+
+    # 2. 只查询当前这一页
+    try:
+        page, next_cursor = paginate_submissions(stmt, cursor, limit)
+    except ValueError as exc:
+        return jsonify({
+            'status': 'error',
+            'message': str(exc)
+        }), 400
+
+    # 3. 构建JSON响应，count 表示本页条数；data 在最后由预编译的行编码函数直接生成
     response = {
         'status': 'success',
-        'message': f'成功获取 {len(submissions_list)} 条记录',
-        'count': len(submissions_list),
-        'data': submissions_list  # 主要数据在这里
+        'message': f'成功获取 {len(page)} 条记录',
+        'count': len(page),
+        'next_cursor': next_cursor,
     }
-    
-    # 4. 使用 jsonify 将Python字典转换为JSON格式的HTTP响应
-    return jsonify(response)
+    if changes_cursor is not None:
+        response['changes_cursor'] = changes_cursor
+    if count_mode and mine:
+        # 当前用户的总数直接读取计数列，精确且廉价
+        response['total'] = get_submission_count(current_user.id)
+        response['total_is_estimate'] = False
+    elif count_mode:
+        response['total'] = count_submissions(count_mode)
+        response['total_is_estimate'] = count_mode == 'estimate'
+
+    # 4. 输出与 jsonify(response) 完全相同，data 中每条记录的格式与 to_dict() 相同
+    return json_response_with_rows(response, 'data', map(encode_submission_row, page))
+
+def _changes_request():
+    """解析变更接口的公共参数，返回 (since, user_id) 或错误响应"""
+    # EventSource 自动重连时会带上最后收到的事件 id，它比 URL 中最初的 since 更新
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+    user_id = None
+    if request.args.get('mine') == '1':
+        if not current_user.is_authenticated:
+            return None, (jsonify({'status': 'error', 'message': '请先登录'}), 401)
+        user_id = current_user.id
+    if since is not None:
+        try:
+            changes.check_cursor(since)
+        except changes.ChangeCursorError as exc:
+            return None, (jsonify({
+                'status': 'error',
+                'message': str(exc),
+                'cursor': changes.high_water_mark()
+            }), 410)
+    return (since, user_id), None
+
+
+@main.route('/api/submissions/changes', methods=['GET'])
+@read_only
+def api_submission_changes():
+    """
+    GET /api/submissions/changes?since=<变更游标>&mine=1&timeout=25
+    长轮询：返回游标之后新增和删除的记录；暂时没有变更时最多等待 timeout 秒。
+    不带 since 时立即返回当前游标。游标失效（日志已清理）时返回 410，页面应重新加载整个列表。
+    本 worker 挂起的请求已满时不等待，立即返回当前的变更，并带上 retry_after（秒）：页面应隔这么久再请求。
+    """
+    parsed, error = _changes_request()
+    if error:
+        return error
+    since, user_id = parsed
+    config = current_app.config
+    payload = {'status': 'success'}
+    if since is None:
+        events, cursor = [], changes.high_water_mark()
+    else:
+        timeout = request.args.get('timeout', config['CHANGES_LONG_POLL_TIMEOUT'], type=float)
+        timeout = max(0.0, min(timeout, config['CHANGES_LONG_POLL_TIMEOUT']))
+        waiting = timeout > 0 and changes.waiters.try_acquire()
+        if timeout > 0 and not waiting:
+            timeout = 0
+            payload['retry_after'] = config['CHANGES_BUSY_RETRY_SECONDS']
+        try:
+            events, cursor = changes.wait_for_changes(
+                since, user_id, timeout=timeout,
+                interval=config['CHANGES_POLL_INTERVAL_MS'] / 1000)
+        finally:
+            if waiting:
+                changes.waiters.release()
+    payload.update(count=len(events), cursor=cursor)
+    response = json_response_with_rows(payload, 'changes', events)
+    if 'retry_after' in payload:
+        response.headers['Retry-After'] = str(payload['retry_after'])
+    return response
+
+
+@main.route('/api/submissions/changes/stream', methods=['GET'])
+@read_only
+def api_submission_changes_stream():
+    """
+    GET /api/submissions/changes/stream?since=<变更游标>&mine=1
+    Server-Sent Events：每批变更是一条 changes 事件，data 与长轮询接口的 changes 数组相同，
+    事件 id 是新的游标。连接保持 CHANGES_STREAM_SECONDS 秒后关闭，浏览器会带着 Last-Event-ID 自动重连。
+    本 worker 挂起的请求已满时返回 503 和 Retry-After，页面应改用短间隔的轮询。
+    """
+    parsed, error = _changes_request()
+    if error:
+        return error
+    since, user_id = parsed
+    if since is None:
+        since = changes.high_water_mark()
+    config = current_app.config
+    interval = config['CHANGES_POLL_INTERVAL_MS'] / 1000
+    if not changes.waiters.try_acquire():
+        db.session.close()
+        retry_after = config['CHANGES_BUSY_RETRY_SECONDS']
+        response = jsonify({
+            'status': 'error',
+            'message': '服务器繁忙，请改用轮询获取变更',
+            'retry_after': retry_after
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    def generate(since):
+        deadline = time.monotonic() + config['CHANGES_STREAM_SECONDS']
+        yield f'retry: 3000\nid: {since}\n\n'
+        while time.monotonic() < deadline:
+            # 每 15 秒至少发送一次数据（心跳），避免代理因为空闲断开连接
+            timeout = min(15, deadline - time.monotonic())
+            events, since = changes.wait_for_changes(since, user_id, timeout=timeout, interval=interval)
+            if events:
+                yield f'id: {since}\nevent: changes\ndata: [{",".join(events)}]\n\n'
+            else:
+                yield f': keep-alive\nid: {since}\n\n'
+        db.session.close()
+
+    response = Response(stream_with_context(generate(since)), mimetype='text/event-stream')
+    # 响应关闭时（正常结束或客户端断开）归还名额
+    response.call_on_close(changes.waiters.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # 让 nginx 不要缓冲事件流
+    return response
+
+
+# API 路由：提交记录统计
+@main.route('/api/submissions/stats', methods=['GET'])
+@conditional_on_table('contact_submission')
+def api_submission_stats():
+    """
+    GET /api/submissions/stats?from=2024-01-01&to=2024-01-31&category=<类型>
+    返回按 (日期, 类型, 是否订阅) 汇总的提交数量，以及按类型、按订阅的合计。
+    数据来自增量维护的汇总表，查询代价与天数×类型数成正比，与记录总数无关。
+    """
+    query = SubmissionDailyStat.query
+    try:
+        if request.args.get('from'):
+            query = query.filter(SubmissionDailyStat.day >= date.fromisoformat(request.args['from']))
+        if request.args.get('to'):
+            query = query.filter(SubmissionDailyStat.day <= date.fromisoformat(request.args['to']))
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': '日期格式应为 YYYY-MM-DD'
+        }), 400
+    if request.args.get('category'):
+        query = query.filter(SubmissionDailyStat.category == request.args['category'])
+
+    rows = query.filter(SubmissionDailyStat.count > 0).order_by(
+        SubmissionDailyStat.day, SubmissionDailyStat.category, SubmissionDailyStat.subscribe).all()
+
+    by_category = {}
+    by_subscribe = {'true': 0, 'false': 0}
+    for row in rows:
+        by_category[row.category] = by_category.get(row.category, 0) + row.count
+        by_subscribe['true' if row.subscribe else 'false'] += row.count
+
+    return jsonify({
+        'status': 'success',
+        'total': sum(by_category.values()),
+        'by_category': by_category,
+        'by_subscribe': by_subscribe,
+        'data': [
+            {
+                'day': row.day.isoformat(),
+                'category': row.category,
+                'subscribe': row.subscribe,
+                'count': row.count
+            }
+            for row in rows
+        ]
+    })
+
+
+SEARCH_PAGE_SIZE = 20
+
+
+# API 路由：全文搜索提交记录
+@main.route('/api/submissions/search', methods=['GET'])
+@login_required
+@conditional_on_table('contact_submission')
+def api_search_submissions():
+    """
+    GET /api/submissions/search?q=<关键词>&limit=20&offset=0
+    在姓名、邮箱和留言中全文搜索，按相关度（bm25）排序。
+    每条结果带有 snippet 字段：命中的片段，关键词用 <mark> 标出（已做HTML转义）。
+    """
+    if not search.is_supported(db.engine):
+        return jsonify({
+            'status': 'error',
+            'message': '当前数据库不支持全文搜索'
+        }), 501
+
+    q = request.args.get('q', '')
+    limit = request.args.get('limit', SEARCH_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, SUBMISSIONS_MAX_PAGE_SIZE))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    try:
+        results, next_offset = search.search_submissions(q, limit, offset)
+    except search.SearchQueryError as exc:
+        return jsonify({
+            'status': 'error',
+            'message': str(exc)
+        }), 400
+
+    return jsonify({
+        'status': 'success',
+        'message': f'找到 {len(results)} 条相关记录',
+        'count': len(results),
+        'next_offset': next_offset,
+        'data': results
+    })
+
+# 导出时每批从数据库读取的行数
+EXPORT_BATCH_SIZE = 500
+EXPORT_CSV_FIELDS = ['id', 'name', 'email', 'category', 'message', 'subscribe', 'submitted_at']
+
+
+# API 路由：流式导出提交记录
+@main.route('/api/submissions/export', methods=['GET'])
+def api_export_submissions():
+    """
+    GET /api/submissions/export?format=ndjson|csv&since=<ISO时间>&category=<类型>
+    以 NDJSON（每行一个JSON对象）或 CSV 流式导出提交记录，按 id 升序。
+    数据库按批读取、边读边发送，内存占用不随记录总数增长。
+    since 只导出该时间（含）之后提交的记录，用于增量导出。
+    """
+    # 1. 解析参数
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({
+            'status': 'error',
+            'message': 'format 参数只能是 ndjson 或 csv'
+        }), 400
+
+    query = ContactSubmission.query
+    since = request.args.get('since')
+    if since:
+        try:
+            query = query.filter(ContactSubmission.submitted_at >= datetime.fromisoformat(since))
+        except ValueError:
+            return jsonify({
+                'status': 'error',
+                'message': f'无效的 since 时间: {since}'
+            }), 400
+    category = request.args.get('category')
+    if category:
+        query = query.filter(ContactSubmission.category == category)
+
+    # 2. yield_per 让数据库游标分批返回结果，而不是一次性加载所有行
+    rows = query.order_by(ContactSubmission.id).yield_per(EXPORT_BATCH_SIZE)
+
+    def generate_ndjson():
+        for sub in rows:
+            yield json.dumps(sub.to_dict(), ensure_ascii=False) + '\n'
+
+    def generate_csv():
+        import csv  # 只有导出 CSV 时才用到，延迟导入
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_FIELDS)
+        writer.writeheader()
+        for sub in rows:
+            writer.writerow(sub.to_dict())
+            # 每满一批就把缓冲区内容发送出去
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    # 3. 返回生成器响应；stream_with_context 保证生成器执行期间数据库会话仍然可用
+    if export_format == 'csv':
+        generator, mimetype = generate_csv(), 'text/csv'
+    else:
+        generator, mimetype = generate_ndjson(), 'application/x-ndjson'
+    response = Response(stream_with_context(generator), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=submissions.{export_format}'
+    return response
+
+# API 提交记录的必填字段
+SUBMISSION_REQUIRED_FIELDS = ['name', 'email', 'message']
+
+
+def validate_submission_data(data):
+    """校验一条 API 提交的数据，通过返回 None，否则返回错误信息"""
+    if not isinstance(data, dict):
+        return '每条记录必须是一个JSON对象'
+    for field in SUBMISSION_REQUIRED_FIELDS:
+        if not data.get(field):
+            return f'缺少必填字段: {field}'
+        if not isinstance(data[field], str):
+            return f'字段 {field} 必须是字符串'
+    # 类型错误要在这里发现：批量导入时前面的批次可能已经提交，不能等到写入数据库时才失败
+    if 'category' in data and not isinstance(data['category'], str):
+        return '字段 category 必须是字符串'
+    if 'subscribe' in data and not isinstance(data['subscribe'], bool):
+        return '字段 subscribe 必须是 true 或 false'
+    return None
+
+
+def submission_values(data):
+    """从已校验的数据中取出要写入数据库的字段（忽略多余字段）"""
+    return {
+        'name': data['name'],
+        'email': data['email'],
+        'category': data.get('category', 'general'),  # 使用 .get() 提供默认值
+        'message': data['message'],
+        'subscribe': data.get('subscribe', False),
+        'user_id': current_user.id if current_user.is_authenticated else None,  # 关联当前用户
+        # 显式给出提交时间：批量写入时统计汇总需要知道记录属于哪一天
+        'submitted_at': datetime.utcnow()
+    }
+
 
 # API 路由：创建一条新记录
-@app.route('/api/submission', methods=['POST'])
+@main.route('/api/submission', methods=['POST'])
+@admission.limit_writes
 def api_create_submission():
     """
     POST /api/submission
@@ -249,27 +873,18 @@ def api_create_submission():
     data = request.get_json()
     
     # 3. 简单的数据验证（生产环境需要更严格的验证）
-    required_fields = ['name', 'email', 'message']
-    for field in required_fields:
-        if not data.get(field):
-            return jsonify({
-                'status': 'error',
-                'message': f'缺少必填字段: {field}'
-            }), 400
+    error = validate_submission_data(data)
+    if error:
+        return jsonify({
+            'status': 'error',
+            'message': error
+        }), 400
     
-    # 4. 创建新记录（忽略我们表单中不需要的字段，如category和subscribe）
-    new_submission = ContactSubmission(
-        name=data['name'],
-        email=data['email'],
-        category=data.get('category', 'general'),  # 使用 .get() 提供默认值
-        message=data['message'],
-        subscribe=data.get('subscribe', False),
-        user_id=current_user.id if current_user.is_authenticated else None  # 关联当前用户
-    )
+    # 4. 创建新记录
+    new_submission = ContactSubmission(**submission_values(data))
     
     # 5. 保存到数据库
-    db.session.add(new_submission)
-    db.session.commit()
+    save_submission(new_submission)
     
     # 6. 返回成功响应，包含新记录的ID
     return jsonify({
@@ -284,13 +899,110 @@ def api_create_submission():
         }
     }), 201  # 201 是资源创建成功的状态码   
 
-@app.route('/profile')
+# 批量导入：每个事务写入的行数，以及单次请求允许的最大记录数
+BATCH_CHUNK_SIZE = 500
+BATCH_MAX_RECORDS = 10000
+
+
+def parse_batch_body():
+    """
+    解析批量导入的请求体，支持两种格式：
+    - application/json：JSON数组
+    - application/x-ndjson：每行一个JSON对象（与 requests.jsonl 相同）
+    返回 (记录列表, 错误信息)
+    """
+    if request.mimetype == 'application/x-ndjson':
+        records = []
+        for line_no, line in enumerate(request.get_data(as_text=True).splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                return None, f'第 {line_no} 行不是有效的JSON'
+        return records, None
+    if request.is_json:
+        records = request.get_json(silent=True)
+        if not isinstance(records, list):
+            return None, '请求体必须是JSON数组'
+        return records, None
+    return None, '请求的内容类型必须是 application/json 或 application/x-ndjson'
+
+
+# API 路由：批量创建记录
+@main.route('/api/submissions/batch', methods=['POST'])
+@admission.limit_writes
+def api_batch_create_submissions():
+    """
+    POST /api/submissions/batch
+    一次提交多条记录（JSON数组或NDJSON）。
+    每条记录使用与 /api/submission 相同的校验规则；合法记录按批
+    用 executemany 写入，每批一个事务，返回逐条的处理结果。
+    """
+    # 1. 解析请求体
+    records, error = parse_batch_body()
+    if error:
+        return jsonify({
+            'status': 'error',
+            'message': error
+        }), 400
+    if not records:
+        return jsonify({
+            'status': 'error',
+            'message': '请求体中没有任何记录'
+        }), 400
+    if len(records) > BATCH_MAX_RECORDS:
+        return jsonify({
+            'status': 'error',
+            'message': f'单次最多提交 {BATCH_MAX_RECORDS} 条记录'
+        }), 413
+
+    # 2. 逐条校验，合法的记录等待写入
+    results = [None] * len(records)
+    pending = []  # (原始下标, 字段值)
+    for index, data in enumerate(records):
+        error = validate_submission_data(data)
+        if error:
+            results[index] = {'index': index, 'status': 'error', 'message': error}
+        else:
+            values = submission_values(data)
+            # 写后缓冲模式下 ID 由号段分配，批量导入也必须从同一个号段取ID，避免冲突
+            if get_submission_writer() is not None:
+                values['id'] = get_submission_writer().allocator.next_id()
+            pending.append((index, values))
+
+    # 3. 分批写入：每批一次 executemany + 一次提交，避免每条记录都 fsync
+    stmt = insert(ContactSubmission).returning(ContactSubmission.id, sort_by_parameter_order=True)
+    for start in range(0, len(pending), BATCH_CHUNK_SIZE):
+        chunk = pending[start:start + BATCH_CHUNK_SIZE]
+        rows = [values for _, values in chunk]
+        new_ids = db.session.scalars(stmt, rows).all()
+        for values, new_id in zip(rows, new_ids):
+            values['id'] = new_id
+        # executemany 不会触发 ORM 事件，派生计数和变更日志需要显式维护
+        apply_submission_changes(db.session.connection(), added=rows)
+        db.session.commit()
+        for (index, _), new_id in zip(chunk, new_ids):
+            results[index] = {'index': index, 'status': 'success', 'id': new_id}
+
+    created = len(pending)
+    return jsonify({
+        'status': 'success' if created == len(records) else 'partial',
+        'message': f'成功创建 {created} 条记录，失败 {len(records) - created} 条',
+        'created': created,
+        'failed': len(records) - created,
+        'results': results
+    }), 201 if created else 400
+
+@main.route('/profile')
 @login_required
+@read_only
 def profile():
     """用户个人资料页面"""
     # 可以在这里准备更多用户相关的统计数据
     # 例如：计算用户的提交总数
-    submission_count = len(current_user.submissions)
+    # 读取反范式计数列：一次主键查询，不需要加载任何提交记录
+    submission_count = get_submission_count(current_user.id)
     
     profile_data = {
         'page_title': '个人资料',
@@ -300,14 +1012,45 @@ def profile():
     }
     return render_template('profile.html', **profile_data)
 
-@app.route('/api/submission/<int:id>', methods=['DELETE'])
+@main.route('/api/user-cache/stats', methods=['GET'])
+@login_required
+def api_user_cache_stats():
+    """查看当前 worker 进程中用户缓存的命中情况"""
+    return jsonify({
+        'status': 'success',
+        'pid': os.getpid(),
+        'data': user_cache.stats()
+    })
+
+@main.route('/api/page-cache/stats', methods=['GET'])
+@login_required
+def api_page_cache_stats():
+    """查看当前 worker 进程中匿名页面缓存的命中情况"""
+    return jsonify({
+        'status': 'success',
+        'pid': os.getpid(),
+        'data': page_cache.stats()
+    })
+
+@main.route('/api/password-hasher/stats', methods=['GET'])
+@login_required
+def api_password_hasher_stats():
+    """查看当前 worker 进程中密码哈希进程池的排队和执行情况"""
+    return jsonify({
+        'status': 'success',
+        'pid': os.getpid(),
+        'data': password_hasher.stats()
+    })
+
+@main.route('/api/submission/<int:id>', methods=['DELETE'])
+@admission.limit_writes
 @login_required
 def api_delete_submission(id):
     """通过API删除记录"""
     submission = ContactSubmission.query.get_or_404(id)
     
     # 权限检查：只能删除自己的记录
-    if submission.author != current_user:
+    if submission.user_id != current_user.id:
         return jsonify({
             'status': 'error',
             'message': '权限不足：您只能删除自己的记录'
@@ -321,14 +1064,114 @@ def api_delete_submission(id):
         'message': f'记录 #{id} 已删除'
     })
 
-# 应用启动时初始化数据库
-with app.app_context():
-    db.create_all()  # 创建所有数据库表（如果不存在）    # 打印已注册的所有路由（调试用）
-    registered_endpoints = sorted(app.view_functions.keys())
-    print("\n" + "="*60)
-    print("✅ Flask 应用已加载，已注册的路由端点：")
-    print(registered_endpoints)
-    print("="*60 + "\n")
+# 一次批量删除最多的记录数
+BULK_DELETE_MAX_IDS = 1000
+
+@main.route('/api/submissions/bulk-delete', methods=['POST'])
+@admission.limit_writes
+@login_required
+def api_bulk_delete_submissions():
+    """
+    POST /api/submissions/bulk-delete  {"ids": [1, 2, 3]}
+    用一条 DELETE ... WHERE id IN (...) AND user_id = 当前用户 删除多条记录。
+    不存在或不属于当前用户的 ID 不会被删除，在 skipped 中返回。
+    """
+    payload = request.get_json(silent=True)
+    ids = payload.get('ids') if isinstance(payload, dict) else None
+    if (not isinstance(ids, list) or not ids
+            or not all(isinstance(id, int) and not isinstance(id, bool) for id in ids)):
+        return jsonify({
+            'status': 'error',
+            'message': 'ids 必须是非空的整数数组'
+        }), 400
+    if len(ids) > BULK_DELETE_MAX_IDS:
+        return jsonify({
+            'status': 'error',
+            'message': f'一次最多删除 {BULK_DELETE_MAX_IDS} 条记录'
+        }), 400
+
+    requested = set(ids)
+    removed = delete_submissions(db.session.connection(), and_(
+        ContactSubmission.id.in_(requested),
+        ContactSubmission.user_id == current_user.id
+    ))
+    db.session.commit()
+
+    deleted = sorted(row.id for row in removed)
+    return jsonify({
+        'status': 'success',
+        'message': f'已删除 {len(deleted)} 条记录',
+        'deleted': deleted,
+        'skipped': sorted(requested.difference(deleted))
+    })
+
+@main.cli.command('upgrade-db')
+def upgrade_db_command():
+    """创建缺失的表，并为已有数据库补齐新增的列和索引"""
+    upgrade_schema()
+    print('✅ 数据库结构已是最新')
+
+@main.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """根据现有数据重建全文搜索索引"""
+    if not search.is_supported(db.engine):
+        print('⚠️ 当前数据库不支持全文搜索')
+        return
+    with db.engine.begin() as conn:
+        search.install_fts(conn)
+        search.rebuild_fts(conn)
+    print('✅ 全文搜索索引已重建')
+
+@main.cli.command('archive-submissions')
+@click.option('--days', type=int, default=None, help='保留天数，默认使用 SUBMISSION_RETENTION_DAYS')
+@click.option('--chunk-size', type=int, default=1000, show_default=True, help='每个事务移动的记录数')
+@click.option('--archive-db', default=None, help='归档到单独的 SQLite 文件，默认使用 SUBMISSION_ARCHIVE_DB')
+@click.option('--vacuum/--no-vacuum', default=True, show_default=True, help='归档后归还空闲页')
+@click.option('--enable-incremental-vacuum', is_flag=True, help='把已有数据库切换为 auto_vacuum=INCREMENTAL（执行一次完整 VACUUM）')
+def archive_submissions_command(days, chunk_size, archive_db, vacuum, enable_incremental_vacuum):
+    """把超过保留期的记录移到归档表，并清理旧的变更日志"""
+    config = current_app.config
+    days = config['SUBMISSION_RETENTION_DAYS'] if days is None else days
+    archive_db = archive_db or config['SUBMISSION_ARCHIVE_DB']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    is_sqlite = db.engine.dialect.name == 'sqlite'
+
+    with db.engine.connect() as conn:
+        archive_table = None
+        if archive_db:
+            if not is_sqlite:
+                raise click.UsageError('--archive-db 只支持 SQLite 数据库')
+            archive_table = retention.attach_archive(conn, os.path.abspath(archive_db))
+        try:
+            moved = retention.archive_submissions(
+                conn, cutoff, chunk_size, archive_table,
+                on_chunk=lambda total: print(f'  已归档 {total} 条记录'))
+        finally:
+            if archive_table is not None:
+                retention.detach_archive(conn)
+        print(f'✅ 已把 {moved} 条 {cutoff:%Y-%m-%d} 之前的记录移到归档表')
+
+        pruned = retention.prune_change_log(
+            conn, datetime.utcnow() - timedelta(hours=config['CHANGES_RETENTION_HOURS']))
+        print(f'✅ 已清理 {pruned} 条变更日志')
+
+        if is_sqlite and enable_incremental_vacuum:
+            retention.enable_incremental_vacuum(conn)
+            print('✅ 已切换为 auto_vacuum=INCREMENTAL')
+        elif is_sqlite and vacuum:
+            freed, enabled = retention.incremental_vacuum(conn)
+            if enabled:
+                print(f'✅ 已归还 {freed} 个空闲页')
+            else:
+                print('⚠️ 数据库未启用 auto_vacuum=INCREMENTAL，空闲页不会归还；'
+                      '可以使用 --enable-incremental-vacuum 切换（一次性）')
+
+@main.cli.command('build-assets')
+def build_assets_command():
+    """生成带内容哈希的静态资源和 gzip/brotli 预压缩文件"""
+    manifest = build_assets(current_app.static_folder)
+    assets.load_manifest()
+    print(f'✅ 已生成 {len(manifest)} 个静态资源')
 
 """
 if __name__ == '__main__':
@@ -336,6 +1179,17 @@ if __name__ == '__main__':
 """
 
 if __name__ == '__main__':
+    app = create_app()
+    # 本地开发时顺便把数据库结构升级到最新；服务器上请单独执行 flask --app app upgrade-db
+    with app.app_context():
+        upgrade_schema()
+    # 打印已注册的所有路由（调试用）
+    registered_endpoints = sorted(app.view_functions.keys())
+    print("\n" + "="*60)
+    print("✅ Flask 应用已加载，已注册的路由端点：")
+    print(registered_endpoints)
+    print("="*60 + "\n")
+
     port = int(os.environ.get('PORT', 5000))
     # 开发环境用调试模式，生产环境关闭
 #    debug = os.environ.get('FLASK_DEBUG', 'false').lower() == 'true'
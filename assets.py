@@ -0,0 +1,157 @@
+# assets.py
+"""
+静态资源处理。
+
+构建（python assets.py 或 flask --app app build-assets）：
+  把 static/css、static/js 下的文件复制到 static/dist，文件名带上内容哈希
+  （如 base.3f2a9c1e.css），同时生成 .gz 和 .br 预压缩版本，以及 manifest.json。
+运行时：
+  - 模板中用 asset_url('css/base.css') 得到带哈希的地址；没有构建过时退回普通的 static 地址
+  - /assets/<文件名> 按 Accept-Encoding 返回预压缩文件，并设置一年的 immutable 缓存
+  - 较大的 HTML/JSON 动态响应在返回前做 gzip 压缩
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # 可选依赖：没有安装时只生成 .gz
+    brotli = None
+
+ASSET_DIRS = ['css', 'js']
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+COMPRESSIBLE_MIMETYPES = {'text/html', 'application/json'}
+
+# Accept-Encoding 中的编码 -> 预压缩文件的后缀（按优先级排列）
+PRECOMPRESSED = [('br', '.br'), ('gzip', '.gz')]
+
+
+def build_assets(static_folder):
+    """生成带内容哈希的资源文件和预压缩版本，返回 manifest（原路径 -> 带哈希的文件名）"""
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+    os.makedirs(dist)
+
+    manifest = {}
+    for asset_dir in ASSET_DIRS:
+        source_dir = os.path.join(static_folder, asset_dir)
+        if not os.path.isdir(source_dir):
+            continue
+        for filename in sorted(os.listdir(source_dir)):
+            with open(os.path.join(source_dir, filename), 'rb') as f:
+                content = f.read()
+            stem, ext = os.path.splitext(filename)
+            digest = hashlib.sha256(content).hexdigest()[:12]
+            hashed = f'{stem}.{digest}{ext}'
+            _write(os.path.join(dist, hashed), content)
+            _write(os.path.join(dist, hashed + '.gz'), gzip.compress(content, 9, mtime=0))
+            if brotli is not None:
+                _write(os.path.join(dist, hashed + '.br'), brotli.compress(content))
+            manifest[f'{asset_dir}/{filename}'] = hashed
+
+    with open(os.path.join(dist, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def _write(path, content):
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+class Assets:
+    """资源地址解析、预压缩文件服务和动态响应压缩，用法：assets.init_app(app)"""
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.dist_folder = None
+        self.compress_min_size = 1024
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.dist_folder = os.path.join(app.static_folder, DIST_DIR)
+        self.compress_min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+        self.load_manifest()
+        app.add_template_global(self.asset_url, 'asset_url')
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.serve)
+        app.after_request(self.compress_response)
+        app.extensions['assets'] = self
+
+    def load_manifest(self):
+        path = os.path.join(self.dist_folder, MANIFEST_NAME)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {}
+
+    def asset_url(self, filename):
+        """资源地址：构建过则返回带哈希的 /assets/ 地址，否则返回普通的 static 地址"""
+        hashed = self.manifest.get(filename)
+        if hashed is None:
+            return url_for('static', filename=filename)
+        return url_for('assets', filename=hashed)
+
+    def serve(self, filename):
+        """返回带哈希的资源文件，优先使用客户端支持的预压缩版本"""
+        accepted = request.accept_encodings
+        encoding = None
+        for name, suffix in PRECOMPRESSED:
+            if accepted[name] and os.path.exists(os.path.join(self.dist_folder, filename + suffix)):
+                encoding, filename_to_send = name, filename + suffix
+                break
+        if encoding is None:
+            filename_to_send = filename
+
+        response = send_from_directory(self.dist_folder, filename_to_send)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+            # mimetype 按原始文件名设置，而不是 .gz/.br
+            response.mimetype = _guess_mimetype(filename)
+        # 文件名带有内容哈希，内容变化时文件名也会变，可以永久缓存
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def compress_response(self, response):
+        """对较大的 HTML/JSON 动态响应做 gzip 压缩"""
+        if (response.status_code != 200
+                or response.direct_passthrough
+                or response.is_streamed
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or 'Content-Encoding' in response.headers
+                or not request.accept_encodings['gzip']):
+            return response
+        body = response.get_data()
+        if len(body) < self.compress_min_size:
+            return response
+        response.set_data(gzip.compress(body, 6))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        # 压缩后的字节与原文不同，强 ETag 需要改成弱 ETag
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def _guess_mimetype(filename):
+    if filename.endswith('.css'):
+        return 'text/css'
+    if filename.endswith('.js'):
+        return 'text/javascript'
+    return 'application/octet-stream'
+
+
+if __name__ == '__main__':
+    # 不需要加载整个应用，Docker 构建镜像时直接运行本文件
+    built = build_assets(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    print(f'✅ 已生成 {len(built)} 个静态资源')
@@ -0,0 +1,543 @@
+# bench/bench.py
+"""
+可复现的压测与基准工具。
+
+1. 生成指定规模的数据库（结构与 site.db 相同）：
+   python bench/bench.py seed --db /tmp/bench.db --users 100 --submissions 100000
+
+2. 按流量配比压测（默认使用 Flask 测试客户端，在本进程内运行）：
+   python bench/bench.py run --db /tmp/bench.db --duration 30 --concurrency 4
+
+   也可以压测本地 gunicorn（自动启动，结束后关闭）或任意已运行的实例：
+   python bench/bench.py run --db /tmp/bench.db --gunicorn --workers 4
+   python bench/bench.py run --url http://127.0.0.1:5000
+
+3. 与基准对比：--save-baseline 保存本次结果，之后的运行自动与之对比。
+
+4. 启动耗时（从 import 到第一个响应）：
+   python bench/bench.py startup --repeat 5 [--gunicorn]
+
+5. 列表序列化：ORM + to_dict() + jsonify 与列查询 + 预编译行编码函数的对比（并校验输出完全相同）：
+   python bench/bench.py serialize --db /tmp/bench.db --rows 50,200,1000,5000
+
+流量配比（--mix）中可用的场景：
+  api_post     POST /api/submission，记录来自 --records 指定的 JSONL 文件（如 requests.jsonl）
+  api_list     GET /api/submissions，翻 1~3 页
+  login        GET /login 取 CSRF token，再 POST /login
+  contact      GET /contact 取 CSRF token，再 POST /contact
+  submissions  已登录用户访问 /submissions 和 /api/submissions?mine=1
+  profile      已登录用户访问 /profile
+  home         GET /
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BENCH_PASSWORD = 'benchpass'
+DEFAULT_MIX = 'api_post=3,api_list=4,login=1,contact=1,submissions=2,profile=1,home=2'
+DEFAULT_BASELINE = os.path.join(ROOT, 'bench', 'baseline.json')
+CATEGORIES = ['general', 'technical', 'feedback', 'other']
+CSRF_RE = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+# SQLAlchemy 在 SQLite 中保存 DateTime 的格式；游标分页按字符串比较，直接写 SQL 时必须与它一致
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+# ---- 生成数据 ----
+
+def seed(db_path, users, submissions, chunk=10000):
+    """生成 users 个用户和 submissions 条提交记录，派生数据（计数、统计、全文索引）一并生成"""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    from app import create_app
+    from models import db
+    from migrations import upgrade_schema, _backfill_daily_stats
+    from werkzeug.security import generate_password_hash
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.abspath(db_path)})
+    with app.app_context():
+        upgrade_schema()
+
+    # 所有用户使用同一个密码哈希，避免生成数据时花大量时间计算 scrypt
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            'INSERT INTO user (id, username, email, password_hash, member_since, submission_count) '
+            'VALUES (?, ?, ?, ?, ?, 0)',
+            [(i, f'bench{i}', f'bench{i}@example.com', password_hash, start.strftime(SQLITE_DATETIME_FORMAT))
+             for i in range(1, users + 1)]
+        )
+    for offset in range(0, submissions, chunk):
+        rows = []
+        for i in range(offset, min(offset + chunk, submissions)):
+            user_id = rng.randint(1, users) if users and rng.random() < 0.7 else None
+            submitted_at = start + timedelta(seconds=i * 30)
+            rows.append((
+                f'压测用户{i}', f'lead{i}@example.com', rng.choice(CATEGORIES),
+                f'这是第 {i} 条压测留言，内容用于测试列表、搜索和导出的性能。',
+                rng.random() < 0.3, submitted_at.strftime(SQLITE_DATETIME_FORMAT), user_id,
+            ))
+        with conn:
+            conn.executemany(
+                'INSERT INTO contact_submission (name, email, category, message, subscribe, submitted_at, user_id) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        print(f'  已写入 {min(offset + chunk, submissions)}/{submissions} 条记录', end='\r')
+    print()
+    with conn:
+        conn.execute('UPDATE user SET submission_count = '
+                     '(SELECT COUNT(*) FROM contact_submission WHERE user_id = user.id)')
+    conn.close()
+
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('DELETE FROM submission_daily_stat')
+            _backfill_daily_stats(connection)
+    print(f'✅ 已生成 {db_path}：{users} 个用户，{submissions} 条提交记录')
+
+
+# ---- 客户端 ----
+
+class TestClientSession:
+    """Flask 测试客户端（每个压测线程一个，各自保存 cookie）"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None, json_body=None):
+        response = self.client.open(path, method=method, data=form, json=json_body)
+        return response.status_code, response.get_data(as_text=True)
+
+
+class HttpSession:
+    """通过 HTTP 访问真实的服务（gunicorn 等），带 cookie"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            _NoRedirect())
+
+    def request(self, method, path, form=None, json_body=None):
+        data, headers = None, {}
+        if json_body is not None:
+            data = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode('utf-8')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                return response.status, response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read().decode('utf-8', 'replace')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """和测试客户端保持一致：不自动跟随重定向，302 单独计时"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+# ---- 流量场景 ----
+
+class Scenarios:
+    """每个场景是一组请求；每个请求单独计时，按 '方法 路径' 归类"""
+
+    def __init__(self, record, records, users):
+        self.record = record
+        self.records = records
+        self.users = users
+        self.rng = random.Random()
+
+    def _timed(self, session, label, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            status, body = session.request(method, path, **kwargs)
+        except Exception:
+            status, body = 0, ''
+        self.record(label, time.perf_counter() - start, status)
+        return status, body
+
+    def _csrf(self, session, label, path):
+        _, body = self._timed(session, label, 'GET', path)
+        match = CSRF_RE.search(body)
+        return match.group(1) if match else ''
+
+    def _ensure_login(self, session):
+        if getattr(session, 'logged_in', False):
+            return
+        user_id = self.rng.randint(1, self.users)
+        token = self._csrf(session, 'GET /login', '/login')
+        self._timed(session, 'POST /login', 'POST', '/login', form={
+            'csrf_token': token, 'email': f'bench{user_id}@example.com', 'password': BENCH_PASSWORD})
+        session.logged_in = True
+
+    def api_post(self, session):
+        self._timed(session, 'POST /api/submission', 'POST', '/api/submission',
+                    json_body=self.rng.choice(self.records))
+
+    def api_list(self, session):
+        _, body = self._timed(session, 'GET /api/submissions', 'GET', '/api/submissions?limit=50')
+        for _ in range(self.rng.randint(0, 2)):
+            try:
+                cursor = json.loads(body).get('next_cursor')
+            except ValueError:
+                return
+            if not cursor:
+                return
+            _, body = self._timed(session, 'GET /api/submissions?cursor', 'GET',
+                                  '/api/submissions?limit=50&cursor=' + urllib.parse.quote(cursor))
+
+    def login(self, session):
+        token = self._csrf(session, 'GET /login', '/login')
+        user_id = self.rng.randint(1, self.users)
+        self._timed(session, 'POST /login', 'POST', '/login', form={
+            'csrf_token': token, 'email': f'bench{user_id}@example.com', 'password': BENCH_PASSWORD})
+        self._timed(session, 'GET /logout', 'GET', '/logout')
+        session.logged_in = False
+
+    def contact(self, session):
+        token = self._csrf(session, 'GET /contact', '/contact')
+        self._timed(session, 'POST /contact', 'POST', '/contact', form={
+            'csrf_token': token, 'name': '压测', 'email': 'bench@example.com',
+            'category': self.rng.choice(CATEGORIES), 'message': '这是一条来自压测脚本的留言。'})
+
+    def submissions(self, session):
+        self._ensure_login(session)
+        self._timed(session, 'GET /submissions', 'GET', '/submissions')
+        self._timed(session, 'GET /api/submissions?mine=1', 'GET', '/api/submissions?mine=1&count=exact')
+
+    def profile(self, session):
+        self._ensure_login(session)
+        self._timed(session, 'GET /profile', 'GET', '/profile')
+
+    def home(self, session):
+        self._timed(session, 'GET /', 'GET', '/')
+
+
+def load_records(path):
+    """读取 requests.jsonl 格式的记录；没有指定文件时生成一些"""
+    if path:
+        with open(path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        if records:
+            return records
+    return [{'name': f'API压测{i}', 'email': f'api{i}@example.com',
+             'message': f'通过API提交的第 {i} 条压测记录', 'category': CATEGORIES[i % 4]}
+            for i in range(100)]
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if not hasattr(Scenarios, name.strip()):
+            raise SystemExit(f'未知的场景: {name}')
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+# ---- 运行与报告 ----
+
+def run(args):
+    if args.db:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(args.db)
+    if not args.admission:
+        # 压测客户端都来自同一个 IP，默认关闭准入控制，测的是应用本身的吞吐量
+        os.environ['ADMISSION_ENABLED'] = 'false'
+    gunicorn = None
+    if args.gunicorn:
+        port = _free_port()
+        gunicorn = _start_gunicorn(port, args.workers)
+        base_url = f'http://127.0.0.1:{port}'
+        _wait_for(base_url)
+        make_session = lambda: HttpSession(base_url)  # noqa: E731
+        target = f'gunicorn ({args.workers} workers)'
+    elif args.url:
+        make_session = lambda: HttpSession(args.url)  # noqa: E731
+        target = args.url
+    else:
+        from app import create_app
+        app = create_app()
+        make_session = lambda: TestClientSession(app)  # noqa: E731
+        target = 'flask test client'
+
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    shed = defaultdict(int)
+    lock = threading.Lock()
+
+    def record(label, elapsed, status):
+        with lock:
+            samples[label].append(elapsed)
+            # 准入控制拒绝的请求（429 限流、503 繁忙）单独统计，不算作错误
+            if status in (429, 503):
+                shed[label] += 1
+            elif status == 0 or status >= 500:
+                errors[label] += 1
+
+    records = load_records(args.records)
+    weights = parse_mix(args.mix)
+    users = _count_users(args.db) if args.db else args.users
+    deadline = time.monotonic() + args.duration
+
+    def worker(seed_value):
+        scenarios = Scenarios(record, records, max(users, 1))
+        scenarios.rng.seed(seed_value)
+        session = make_session()
+        names, values = list(weights), list(weights.values())
+        while time.monotonic() < deadline:
+            getattr(scenarios, scenarios.rng.choices(names, values)[0])(session)
+
+    print(f'压测目标：{target}，并发 {args.concurrency}，持续 {args.duration} 秒，配比 {args.mix}')
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(args.seed + i,)) for i in range(args.concurrency)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        if gunicorn is not None:
+            gunicorn.send_signal(signal.SIGTERM)
+            gunicorn.wait(10)
+    elapsed = time.monotonic() - started
+
+    results = summarize(samples, errors, shed, elapsed)
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'target': target, 'mix': args.mix, 'results': results}, f, indent=2, ensure_ascii=False)
+        print(f'已保存基准：{args.baseline}')
+
+
+def summarize(samples, errors, shed, elapsed):
+    results = {}
+    for label, values in sorted(samples.items()):
+        values.sort()
+        results[label] = {
+            'count': len(values),
+            'errors': errors[label],
+            'shed': shed[label],
+            'rps': round(len(values) / elapsed, 2),
+            'p50_ms': round(_percentile(values, 50) * 1000, 2),
+            'p95_ms': round(_percentile(values, 95) * 1000, 2),
+            'p99_ms': round(_percentile(values, 99) * 1000, 2),
+        }
+    return results
+
+
+def print_report(results, baseline=None):
+    header = (f'{"端点":<34}{"请求数":>8}{"错误":>6}{"拒绝":>6}{"RPS":>9}'
+              f'{"p50(ms)":>10}{"p95(ms)":>10}{"p99(ms)":>10}')
+    print(header)
+    print('-' * len(header))
+    base = (baseline or {}).get('results', {})
+    for label, r in results.items():
+        line = (f'{label:<34}{r["count"]:>8}{r["errors"]:>6}{r.get("shed", 0):>6}{r["rps"]:>9}'
+                f'{r["p50_ms"]:>10}{r["p95_ms"]:>10}{r["p99_ms"]:>10}')
+        if label in base:
+            line += '   p95 ' + _change(base[label]['p95_ms'], r['p95_ms'])
+            line += ' / RPS ' + _change(base[label]['rps'], r['rps'])
+        print(line)
+
+
+def _change(old, new):
+    if not old:
+        return 'n/a'
+    return f'{(new - old) / old * 100:+.1f}%'
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _count_users(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute('SELECT COUNT(*) FROM user').fetchone()[0]
+
+
+# 在全新的解释器中测量：导入 app、创建应用、处理第一个请求各花了多久
+STARTUP_SNIPPET = """
+import json, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+app = create_app()
+t2 = time.perf_counter()
+app.test_client().get('/about')
+t3 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'create_app_ms': (t2 - t1) * 1000,
+                  'first_response_ms': (t3 - t2) * 1000}))
+"""
+
+
+def startup(args):
+    """测量启动耗时，每项取多次运行的中位数"""
+    runs = defaultdict(list)
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', STARTUP_SNIPPET], cwd=ROOT, check=True,
+                                capture_output=True, text=True).stdout
+        runs['process_total_ms'].append((time.perf_counter() - started) * 1000)
+        for key, value in json.loads(output.strip().splitlines()[-1]).items():
+            runs[key].append(value)
+        if args.gunicorn:
+            port = _free_port()
+            started = time.perf_counter()
+            gunicorn = _start_gunicorn(port, args.workers)
+            try:
+                _wait_for(f'http://127.0.0.1:{port}', interval=0.01)
+                runs['gunicorn_first_response_ms'].append((time.perf_counter() - started) * 1000)
+            finally:
+                gunicorn.send_signal(signal.SIGTERM)
+                gunicorn.wait(10)
+
+    print(f'启动耗时（{args.repeat} 次运行的中位数）：')
+    for key, values in runs.items():
+        values.sort()
+        print(f'  {key:<28}{values[len(values) // 2]:>10.1f} ms')
+
+
+def serialize(args):
+    """在同一个数据库上分别用两种方式生成最新 N 条记录的列表响应，每种取多次运行的中位数"""
+    from flask import jsonify
+    from sqlalchemy import select
+    from app import create_app
+    from models import db, ContactSubmission
+    from serializers import SUBMISSION_COLUMNS, encode_submission_row, json_response_with_rows
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.abspath(args.db)})
+    order = (ContactSubmission.submitted_at.desc(), ContactSubmission.id.desc())
+
+    def orm_to_dict(limit):
+        page = ContactSubmission.query.order_by(*order).limit(limit).all()
+        data = [sub.to_dict() for sub in page]
+        return jsonify({'status': 'success', 'count': len(data), 'data': data}).get_data()
+
+    def columns_encoder(limit):
+        page = db.session.execute(select(*SUBMISSION_COLUMNS).order_by(*order).limit(limit)).all()
+        return json_response_with_rows({'status': 'success', 'count': len(page)}, 'data',
+                                       map(encode_submission_row, page)).get_data()
+
+    print(f'{"rows":>8}{"to_dict ms":>14}{"encoder ms":>14}{"speedup":>10}')
+    with app.test_request_context():
+        for limit in (int(value) for value in args.rows.split(',')):
+            timings = {}
+            for name, build in (('orm', orm_to_dict), ('fast', columns_encoder)):
+                results = []
+                for _ in range(args.repeat):
+                    # 每次都清空 session，和每个请求使用新的 session 一样
+                    db.session.remove()
+                    started = time.perf_counter()
+                    body = build(limit)
+                    results.append((time.perf_counter() - started) * 1000)
+                results.sort()
+                timings[name] = (results[len(results) // 2], body)
+            if timings['orm'][1] != timings['fast'][1]:
+                raise SystemExit(f'{limit} 条记录时两种方式的输出不一致')
+            orm_ms, fast_ms = timings['orm'][0], timings['fast'][0]
+            print(f'{limit:>8}{orm_ms:>14.2f}{fast_ms:>14.2f}{orm_ms / fast_ms:>9.1f}x')
+
+
+def _start_gunicorn(port, workers):
+    """使用项目的 gunicorn.conf.py（preload）在本地启动应用"""
+    env = dict(os.environ, GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_WORKERS=str(workers))
+    return subprocess.Popen(
+        ['gunicorn', '-c', 'gunicorn.conf.py', 'app:create_app()'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(base_url, timeout=30, interval=0.2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base_url + '/about', timeout=1)
+            return
+        except OSError:
+            time.sleep(interval)
+    raise SystemExit(f'服务在 {timeout} 秒内没有启动：{base_url}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='压测与基准工具')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_seed = sub.add_parser('seed', help='生成压测数据库')
+    p_seed.add_argument('--db', required=True)
+    p_seed.add_argument('--users', type=int, default=100)
+    p_seed.add_argument('--submissions', type=int, default=1000)
+
+    p_run = sub.add_parser('run', help='按流量配比压测')
+    p_run.add_argument('--db', help='压测用的数据库（由 seed 生成）')
+    p_run.add_argument('--url', help='压测已运行的服务，而不是测试客户端')
+    p_run.add_argument('--gunicorn', action='store_true', help='启动本地 gunicorn 并压测')
+    p_run.add_argument('--workers', type=int, default=2)
+    p_run.add_argument('--admission', action='store_true', help='保留写接口的准入控制（观察 429/503 的比例）')
+    p_run.add_argument('--users', type=int, default=1, help='使用 --url 时，服务中 bench 用户的数量')
+    p_run.add_argument('--duration', type=float, default=10)
+    p_run.add_argument('--concurrency', type=int, default=4)
+    p_run.add_argument('--mix', default=DEFAULT_MIX)
+    p_run.add_argument('--records', help='api_post 使用的 JSONL 文件（如 requests.jsonl）')
+    p_run.add_argument('--seed', type=int, default=1)
+    p_run.add_argument('--baseline', default=DEFAULT_BASELINE)
+    p_run.add_argument('--save-baseline', action='store_true')
+
+    p_startup = sub.add_parser('startup', help='测量从 import 到第一个响应的启动耗时')
+    p_startup.add_argument('--repeat', type=int, default=5)
+    p_startup.add_argument('--gunicorn', action='store_true', help='同时测量 gunicorn 启动到第一个响应')
+    p_startup.add_argument('--workers', type=int, default=2)
+
+    p_serialize = sub.add_parser('serialize', help='对比列表接口的两种序列化方式')
+    p_serialize.add_argument('--db', required=True, help='由 seed 生成的数据库')
+    p_serialize.add_argument('--rows', default='50,200,1000,5000', help='每次生成的记录条数，逗号分隔')
+    p_serialize.add_argument('--repeat', type=int, default=20)
+
+    args = parser.parse_args()
+    if args.command == 'seed':
+        seed(args.db, args.users, args.submissions)
+    elif args.command == 'startup':
+        startup(args)
+    elif args.command == 'serialize':
+        serialize(args)
+    else:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
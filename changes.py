@@ -0,0 +1,134 @@
+# changes.py
+"""
+提交记录的增量变更（长轮询 / SSE）。
+
+变更来自只追加的 SubmissionChange 日志（由 aggregates.apply_submission_changes 在写入记录的同一事务中写入），
+游标就是日志的 seq：客户端带着上次拿到的游标来请求，只返回之后的新增和删除，不再重新加载整个列表。
+
+等待新变更时只反复查询高水位 MAX(seq)（走主键，代价很小），
+等待期间会归还数据库连接，长时间挂起的请求不会占满连接池。
+
+挂起的请求（SSE 和长轮询）会一直占用一个 gunicorn 线程，所以每个 worker 同时挂起的请求数有上限
+（waiters，见 CHANGES_MAX_WAITERS）：超出时 SSE 返回 503，长轮询不再等待、立即返回，
+并通过 Retry-After / retry_after 告诉页面隔多久再来取，剩下的线程留给普通页面和接口。
+
+游标假定变更按 seq 的顺序提交。SQLite 同一时刻只有一个写事务，这一点总是成立；
+PostgreSQL 等服务器数据库上并发事务可能先分配 seq 后提交，读取方会跳过这样的变更，
+因此增量变更目前只支持 SQLite。
+"""
+import threading
+import time
+
+from sqlalchemy import func, select
+
+from models import db, ContactSubmission, SubmissionChange
+from serializers import SUBMISSION_COLUMNS, encode_submission_row
+
+
+class ChangeCursorError(ValueError):
+    """游标对应的日志已被清理，或者游标比最新的日志还新：客户端需要重新加载整个列表"""
+
+
+class WaiterLimit:
+    """每个 worker 进程中同时挂起的变更请求数的上限，用法：waiters.configure(n)"""
+
+    def __init__(self):
+        self.max_waiters = 0
+        self._slots = None
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.rejected = 0
+
+    def configure(self, max_waiters):
+        self.max_waiters = max_waiters
+        self._slots = threading.BoundedSemaphore(max_waiters)
+
+    def try_acquire(self):
+        """占用一个名额，已满时立即返回 False（不排队）"""
+        acquired = self._slots.acquire(blocking=False)
+        with self._lock:
+            if acquired:
+                self.waiting += 1
+            else:
+                self.rejected += 1
+        return acquired
+
+    def release(self):
+        with self._lock:
+            self.waiting -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {'waiting': self.waiting, 'max_waiters': self.max_waiters, 'rejected': self.rejected}
+
+
+waiters = WaiterLimit()
+
+
+def high_water_mark():
+    """当前最新的变更序号；还没有任何变更时为 0"""
+    return db.session.execute(select(func.max(SubmissionChange.seq))).scalar() or 0
+
+
+def check_cursor(since):
+    low, high = db.session.execute(
+        select(func.min(SubmissionChange.seq), func.max(SubmissionChange.seq))
+    ).one()
+    if since > (high or 0) or (low is not None and since < low - 1):
+        raise ChangeCursorError('变更游标已失效，请重新加载列表')
+
+
+def fetch_changes(since, until, user_id=None, limit=500):
+    """
+    读取 (since, until] 之间的变更，user_id 不为 None 时只返回该用户的记录。
+    返回 (已编码的变更列表, 新游标)。新增事件带完整记录（格式与列表接口相同），删除事件只有 ID；
+    新增后又被删除的记录不再返回新增事件（之后的删除事件仍会返回）。
+    """
+    stmt = (
+        select(SubmissionChange.seq, SubmissionChange.op, SubmissionChange.submission_id)
+        .where(SubmissionChange.seq > since, SubmissionChange.seq <= until)
+        .order_by(SubmissionChange.seq)
+        .limit(limit)
+    )
+    if user_id is not None:
+        stmt = stmt.where(SubmissionChange.user_id == user_id)
+    changes = db.session.execute(stmt).all()
+
+    inserted_ids = [change.submission_id for change in changes if change.op == 'insert']
+    rows = {}
+    if inserted_ids:
+        rows = {row.id: row for row in db.session.execute(
+            select(*SUBMISSION_COLUMNS).where(ContactSubmission.id.in_(inserted_ids))
+        )}
+
+    events = []
+    for change in changes:
+        if change.op == 'delete':
+            events.append('{"id":%d,"op":"delete","seq":%d}' % (change.submission_id, change.seq))
+        elif change.submission_id in rows:
+            events.append('{"data":%s,"op":"insert","seq":%d}' % (
+                encode_submission_row(rows[change.submission_id]), change.seq))
+    # 取满 limit 条说明后面还有，游标停在最后一条；否则 until 之前的变更都已经处理完
+    cursor = changes[-1].seq if len(changes) == limit else until
+    return events, cursor
+
+
+def wait_for_changes(since, user_id=None, timeout=25, interval=0.5, limit=500):
+    """
+    长轮询：有变更时立即返回，否则每隔 interval 秒检查一次，最多等待 timeout 秒。
+    返回 (已编码的变更列表, 新游标)；超时时变更列表为空，游标可能前进（期间只有其他用户的变更）。
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        until = high_water_mark()
+        if until > since:
+            events, since = fetch_changes(since, until, user_id, limit)
+            if events:
+                return events, since
+        # 等待期间不占用数据库连接，也不持有 SQLite 的读快照
+        db.session.close()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return [], since
+        time.sleep(min(interval, remaining))
@@ -0,0 +1,70 @@
+# gunicorn.conf.py
+# 启动：gunicorn -c gunicorn.conf.py 'app:create_app()'
+import gc
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+# 每个 worker 多个线程（gthread）：长轮询和 SSE 请求会长时间挂起，
+# 其中最多 CHANGES_MAX_WAITERS 个线程用于挂起的请求，其余的留给普通页面和接口
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# 各 worker 的指标快照写到同一个目录，/metrics 才能汇总所有 worker；
+# 没有配置时为这次启动单独创建一个临时目录，主进程退出时删除
+# （配置文件在加载应用之前执行，preload 的应用能读到这个环境变量）
+if not os.environ.get('METRICS_DIR'):
+    os.environ['METRICS_DIR'] = _metrics_tmpdir = tempfile.mkdtemp(prefix='submission-metrics-')
+
+# 在主进程里加载好应用再 fork 出 worker：worker 启动更快，
+# 模块、模板等只读数据通过写时复制（copy-on-write）在进程间共享
+preload_app = True
+
+
+def when_ready(server):
+    # 把主进程中已有的对象移出垃圾回收的追踪范围，
+    # 避免 worker 里的 GC 扫描触碰这些内存页、破坏写时复制
+    gc.freeze()
+
+
+def on_starting(server):
+    # 清掉上次运行留下的指标快照（METRICS_DIR 是固定目录时）
+    metrics = server.app.wsgi().extensions.get('metrics')
+    if metrics is not None:
+        metrics.clear()
+
+
+def post_fork(server, worker):
+    # 数据库连接不能跨进程共享：丢弃从主进程继承的连接池（不关闭父进程的连接）
+    from models import db
+    app = server.app.wsgi()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    app = server.app.wsgi()
+    # worker 退出前把写后缓冲队列中剩余的记录写入数据库
+    writer = app.extensions.get('submission_writer')
+    if writer is not None:
+        writer.drain()
+    # 最后写一次指标快照，之后由主进程在 child_exit 中回收（连接池等指标需要应用上下文）
+    metrics = app.extensions.get('metrics')
+    if metrics is not None:
+        with app.app_context():
+            metrics.flush()
+
+
+def child_exit(server, worker):
+    # 在主进程中执行（worker 被杀死时也会调用）：计数器并入 retired.json，删除它的快照文件，
+    # 这样已退出 worker 的进程内状态不会一直被计入，pid 被复用时也不会覆盖旧的计数器
+    metrics = server.app.wsgi().extensions.get('metrics')
+    if metrics is not None:
+        metrics.retire_worker(worker.pid)
+
+
+def on_exit(server):
+    if '_metrics_tmpdir' in globals():
+        shutil.rmtree(_metrics_tmpdir, ignore_errors=True)
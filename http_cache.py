@@ -0,0 +1,146 @@
+# http_cache.py
+"""
+HTTP 条件请求和服务端响应缓存。
+
+- 数据接口：用 TableVersion 中的版本号生成 ETag/Last-Modified，
+  客户端带着 If-None-Match 来请求时，数据没变就直接返回 304，不执行查询。
+- 匿名页面：渲染结果放进每个 worker 内有界的 LRU 缓存，短时间内的重复访问不再渲染模板。
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, request
+from flask_login import current_user
+from sqlalchemy import select
+from werkzeug.http import is_resource_modified
+
+from models import db, TableVersion
+
+
+def get_table_version(name):
+    """返回 (版本号, 最后修改时间)；表还没有被写过时返回 (0, None)"""
+    row = db.session.execute(
+        select(TableVersion.version, TableVersion.changed_at).where(TableVersion.name == name)
+    ).first()
+    return (row.version, row.changed_at) if row else (0, None)
+
+
+def make_etag(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def conditional_on_table(table_name, *etag_parts):
+    """
+    视图装饰器：根据表版本号和请求参数生成 ETag。
+    客户端的缓存仍然有效时直接返回 304，不调用视图函数。
+    etag_parts 是可调用对象，返回值也会参与 ETag 计算（如当前用户ID）。
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version, changed_at = get_table_version(table_name)
+            etag = make_etag(table_name, version, request.full_path,
+                             *(part() for part in etag_parts))
+            last_modified = changed_at.replace(microsecond=0) if changed_at else None
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = Response(status=304)
+            else:
+                response = view(*args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            # 允许缓存，但每次使用前都必须回源验证
+            response.headers['Cache-Control'] = 'no-cache'
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
+
+
+class ResponseCache:
+    """每个 worker 进程内的 LRU + TTL 响应缓存"""
+
+    def __init__(self, maxsize=128, ttl=10):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (过期时间, body, mimetype, etag)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1:]
+            self._data.pop(key, None)
+            self.misses += 1
+            return None
+
+    def set(self, key, body, mimetype, etag):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, body, mimetype, etag)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def configure(self, maxsize, ttl):
+        """调整容量和过期时间（由 create_app 根据配置调用），同时清空已有内容"""
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self._data.clear()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+def cached_page(cache):
+    """
+    视图装饰器：匿名用户的 GET 请求使用缓存的页面。
+    只缓存响应体，不缓存 Set-Cookie 等头；已登录用户的页面含个人信息，不缓存。
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or current_user.is_authenticated:
+                return view(*args, **kwargs)
+
+            key = request.full_path
+            entry = cache.get(key)
+            if entry is None:
+                response = view(*args, **kwargs)
+                if not isinstance(response, Response):
+                    response = Response(response)
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                etag = hashlib.sha1(body).hexdigest()
+                cache.set(key, body, response.mimetype, etag)
+            else:
+                body, mimetype, etag = entry
+                response = Response(body, mimetype=mimetype)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
@@ -0,0 +1,382 @@
+# metrics.py
+"""
+请求级性能指标和 /metrics 接口（Prometheus 文本格式）。
+
+每个请求记录：
+- 各端点的耗时直方图、状态码计数、响应大小
+- SQL 语句条数和耗时（通过 before/after_cursor_execute 事件）
+- 模板渲染耗时
+- N+1 查询：同一条 SELECT 在一个请求内重复执行超过阈值次数
+
+gunicorn 有多个 worker 进程，每个进程只能看到自己的数据。
+设置 METRICS_DIR 后（gunicorn.conf.py 默认会设置），各进程定期把自己的快照写到该目录（每个 pid 一个文件），
+/metrics 读取全部文件：计数器和直方图求和；缓存、连接池等进程内的状态是各进程各自的值，
+不求和，而是带上 pid 标签分别输出。
+worker 退出后由主进程调用 retire_worker()：它的计数器并入 retired.json，pid 文件删除，
+进程内状态随之消失；进程已不存在的 pid 文件也会被忽略。
+"""
+import errno
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import Response, g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# 请求耗时直方图的桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 已退出 worker 的计数器和直方图汇总到这个文件
+RETIRED_FILENAME = 'retired.json'
+
+METRIC_HELP = {
+    'http_requests_total': ('counter', '请求总数'),
+    'http_request_duration_seconds': ('histogram', '请求耗时'),
+    'http_response_size_bytes_total': ('counter', '响应体总字节数'),
+    'db_queries_total': ('counter', 'SQL 语句条数'),
+    'db_query_duration_seconds_total': ('counter', 'SQL 执行总耗时'),
+    'template_render_seconds_total': ('counter', '模板渲染总耗时'),
+    'n_plus_one_detected_total': ('counter', '检测到 N+1 查询的请求数'),
+    'slow_requests_total': ('counter', '慢请求数'),
+}
+
+
+class Metrics:
+    """指标注册表和 Flask 中间件，用法：metrics.init_app(app)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 写快照文件的锁：gthread worker 中多个线程可能同时结束请求
+        self._flush_lock = threading.Lock()
+        self._counters = defaultdict(float)   # (名称, 标签元组) -> 值
+        self._histograms = {}                 # (名称, 标签元组) -> [各桶计数..., 总和, 总数]
+        self._collectors = []                 # 额外的指标来源：返回 {名称: 值} 的函数
+        self.metrics_dir = None
+        self.flush_interval = 5.0
+        self.slow_request_ms = None
+        self.n_plus_one_threshold = 10
+        self._last_flush = 0.0
+
+    def init_app(self, app):
+        self.metrics_dir = app.config.get('METRICS_DIR')
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 5.0)
+        self.slow_request_ms = app.config.get('SLOW_REQUEST_MS')
+        self.n_plus_one_threshold = app.config.get('N_PLUS_ONE_THRESHOLD', 10)
+        self._collectors = []
+        if self.metrics_dir:
+            os.makedirs(self.metrics_dir, exist_ok=True)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._template_started, app)
+        template_rendered.connect(self._template_finished, app)
+        # 监听所有 Engine，包括之后创建的（如只读连接池）；多次创建 app 时只注册一次
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.add_url_rule('/metrics', 'metrics', self.serve)
+        app.extensions['metrics'] = self
+
+    def add_collector(self, name, func):
+        """注册额外的指标：func() 返回 {指标名: 数值}，输出时加上 name_ 前缀"""
+        self._collectors.append((name, func))
+
+    # ---- 记录 ----
+
+    def inc(self, name, labels, value=1.0):
+        with self._lock:
+            self._counters[(name, _label_key(labels))] += value
+
+    def observe(self, name, labels, value):
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    hist[i] += 1
+            hist[-2] += value
+            hist[-1] += 1
+
+    # ---- 请求钩子 ----
+
+    def _start_request(self):
+        g._metrics_start = time.perf_counter()
+        g._metrics_sql_count = 0
+        g._metrics_sql_time = 0.0
+        g._metrics_sql_statements = Counter()
+        g._metrics_sql_statement_time = Counter()
+        g._metrics_sql_selects = Counter()
+        g._metrics_template_time = 0.0
+
+    def _finish_request(self, response):
+        start = g.pop('_metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or 'unknown'
+        labels = {'endpoint': endpoint}
+
+        self.inc('http_requests_total', {
+            'endpoint': endpoint, 'method': request.method, 'status': str(response.status_code)})
+        self.observe('http_request_duration_seconds', labels, elapsed)
+        if not response.is_streamed:
+            self.inc('http_response_size_bytes_total', labels, response.calculate_content_length() or 0)
+        self.inc('db_queries_total', labels, g._metrics_sql_count)
+        self.inc('db_query_duration_seconds_total', labels, g._metrics_sql_time)
+        self.inc('template_render_seconds_total', labels, g._metrics_template_time)
+
+        repeated = [(sql, n) for sql, n in g._metrics_sql_selects.items()
+                    if n >= self.n_plus_one_threshold]
+        if repeated:
+            self.inc('n_plus_one_detected_total', labels)
+            for sql, n in repeated:
+                logger.warning('可能的 N+1 查询：%s 在一次请求中执行了 %d 次：%s',
+                               endpoint, n, _shorten(sql))
+
+        if self.slow_request_ms and elapsed * 1000 >= self.slow_request_ms:
+            self.inc('slow_requests_total', labels)
+            self._log_slow_request(endpoint, elapsed)
+
+        self._maybe_flush()
+        return response
+
+    def _log_slow_request(self, endpoint, elapsed):
+        top = g._metrics_sql_statement_time.most_common(5)
+        breakdown = '\n'.join(
+            f'    {seconds * 1000:8.1f}ms  x{g._metrics_sql_statements[sql]:<4} {_shorten(sql)}'
+            for sql, seconds in top
+        )
+        logger.warning(
+            '慢请求 %s %s (%s)：%.1fms，SQL %d 条共 %.1fms，模板 %.1fms\n%s',
+            request.method, request.full_path, endpoint, elapsed * 1000,
+            g._metrics_sql_count, g._metrics_sql_time * 1000,
+            g._metrics_template_time * 1000, breakdown)
+
+    def _template_started(self, sender, template, context, **extra):
+        if has_request_context():
+            g._metrics_template_start = time.perf_counter()
+
+    def _template_finished(self, sender, template, context, **extra):
+        if has_request_context() and '_metrics_template_start' in g:
+            g._metrics_template_time += time.perf_counter() - g.pop('_metrics_template_start')
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['_metrics_query_start'].pop()
+        # 后台线程（如写后缓冲）没有请求上下文，不计入请求指标
+        if not has_request_context() or '_metrics_sql_statements' not in g:
+            return
+        g._metrics_sql_count += 1
+        g._metrics_sql_time += elapsed
+        g._metrics_sql_statements[statement] += 1
+        g._metrics_sql_statement_time[statement] += elapsed
+        # N+1 只看 SELECT：批量导入按块重复执行的 INSERT/UPDATE 是正常的，逐行的延迟加载才是问题
+        if statement.lstrip()[:6].upper() == 'SELECT':
+            g._metrics_sql_selects[statement] += 1
+
+    # ---- 跨进程汇总 ----
+
+    def snapshot(self):
+        with self._lock:
+            counters = [[name, dict(labels), value] for (name, labels), value in self._counters.items()]
+            histograms = [[name, dict(labels), list(values)] for (name, labels), values in self._histograms.items()]
+        pid = os.getpid()
+        gauges = []
+        for prefix, func in self._collectors:
+            try:
+                values = func()
+            except Exception:
+                # 一个指标来源出错不能影响其他指标（例如 worker 退出时没有应用上下文）
+                logger.warning('指标来源 %s 读取失败', prefix, exc_info=True)
+                continue
+            for name, value in values.items():
+                # 只输出数值（跳过 hit_rate=None、哈希方法名等）
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauges.append([f'{prefix}_{name}', {'pid': str(pid)}, value])
+        return {'pid': pid, 'counters': counters, 'histograms': histograms, 'gauges': gauges}
+
+    def flush(self):
+        """立即写一次本进程的快照（worker 退出前调用）"""
+        self._maybe_flush(force=True)
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.metrics_dir, f'metrics-{pid}.json')
+
+    def _maybe_flush(self, force=False):
+        if not self.metrics_dir:
+            return
+        # 其他线程正在写时，普通请求直接跳过（反正刚写过）；强制写入则等它写完再写一次
+        if not self._flush_lock.acquire(blocking=force):
+            return
+        try:
+            now = time.monotonic()
+            if not force and now - self._last_flush < self.flush_interval:
+                return
+            self._last_flush = now
+            _write_json(self._snapshot_path(os.getpid()), self.snapshot())
+        finally:
+            self._flush_lock.release()
+
+    def _collect_snapshots(self):
+        if not self.metrics_dir:
+            return [self.snapshot()]
+        self._maybe_flush(force=True)
+        snapshots = []
+        for filename in os.listdir(self.metrics_dir):
+            if filename.startswith('metrics-') and filename.endswith('.json'):
+                # 进程已经不存在（被杀死、主进程还没来得及回收）的快照不再计入
+                pid = filename[len('metrics-'):-len('.json')]
+                if not pid.isdigit() or not _pid_alive(int(pid)):
+                    continue
+            elif filename != RETIRED_FILENAME:
+                continue
+            snapshot = _read_json(os.path.join(self.metrics_dir, filename))
+            if snapshot is not None:
+                snapshots.append(snapshot)
+        return snapshots
+
+    def clear(self):
+        """删除目录中上一次运行留下的快照（gunicorn 主进程启动时调用）"""
+        if not self.metrics_dir:
+            return
+        for filename in os.listdir(self.metrics_dir):
+            if filename.endswith(('.json', '.tmp')):
+                os.remove(os.path.join(self.metrics_dir, filename))
+
+    def retire_worker(self, pid):
+        """
+        worker 退出后（gunicorn 主进程的 child_exit 中）调用：
+        把它最后一次写入的计数器和直方图并入 retired.json，进程内状态丢弃，然后删除它的快照文件。
+        只在主进程中调用，不需要跨进程加锁。
+        """
+        if not self.metrics_dir:
+            return
+        path = self._snapshot_path(pid)
+        snapshot = _read_json(path)
+        if snapshot is not None:
+            retired_path = os.path.join(self.metrics_dir, RETIRED_FILENAME)
+            retired = _read_json(retired_path) or {'counters': [], 'histograms': []}
+            counters, histograms = _merge([retired, snapshot])
+            _write_json(retired_path, {
+                'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+                'histograms': [[name, dict(labels), values] for (name, labels), values in histograms.items()],
+            })
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def render(self):
+        """把所有进程的计数器和直方图求和，进程内状态按 pid 分别输出，格式为 Prometheus 文本格式"""
+        snapshots = self._collect_snapshots()
+        counters, histograms = _merge(snapshots)
+        # 带 pid 标签，每个进程各自一条，不会相加
+        for snap in snapshots:
+            for name, labels, value in snap.get('gauges', ()):
+                counters[(name, _label_key(labels))] = value
+
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            kind, help_text = METRIC_HELP.get(name, ('gauge', name))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for name in sorted({name for name, _ in histograms}):
+            kind, help_text = METRIC_HELP.get(name, ('histogram', name))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(LATENCY_BUCKETS, values):
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {count}')
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {values[-1]}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(values[-2])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {values[-1]}')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+def _merge(snapshots):
+    """把多个快照的计数器和直方图按 (名称, 标签) 求和"""
+    counters = defaultdict(float)
+    histograms = {}
+    for snap in snapshots:
+        for name, labels, value in snap['counters']:
+            counters[(name, _label_key(labels))] += value
+        for name, labels, values in snap['histograms']:
+            key = (name, _label_key(labels))
+            if key in histograms:
+                histograms[key] = [a + b for a, b in zip(histograms[key], values)]
+            else:
+                histograms[key] = list(values)
+    return counters, histograms
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as exc:
+        # EPERM：进程存在，只是属于其他用户
+        return exc.errno == errno.EPERM
+    return True
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    # 每次写入使用唯一的临时文件，再原子替换：读取方不会读到写了一半的文件
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for k, v in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _shorten(sql, limit=200):
+    sql = re.sub(r'\s+', ' ', sql).strip()
+    return sql if len(sql) <= limit else sql[:limit] + '...'
+
+
+metrics = Metrics()
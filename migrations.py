@@ -0,0 +1,81 @@
+# migrations.py
+"""
+数据库结构升级。
+
+db.create_all() 只会创建不存在的表，已有的 site.db 不会自动获得新增的列和索引。
+upgrade_schema() 是幂等的，可以在每次启动时执行，也可以通过
+`flask --app app upgrade-db` 手动执行。
+"""
+from sqlalchemy import func, inspect, insert, select, text
+
+from models import db, ContactSubmission, SubmissionDailyStat
+import retention
+import search
+
+
+def _add_user_submission_count(conn):
+    """User.submission_count：新增列并按现有数据回填"""
+    conn.execute(text(
+        'ALTER TABLE "user" ADD COLUMN submission_count INTEGER NOT NULL DEFAULT 0'
+    ))
+    conn.execute(text(
+        'UPDATE "user" SET submission_count = ('
+        'SELECT COUNT(*) FROM contact_submission '
+        'WHERE contact_submission.user_id = "user".id)'
+    ))
+
+
+def _backfill_daily_stats(conn):
+    """SubmissionDailyStat：新建的汇总表按现有记录回填"""
+    sub = ContactSubmission.__table__
+    day = func.date(sub.c.submitted_at)
+    category = func.coalesce(sub.c.category, 'general')
+    subscribe = func.coalesce(sub.c.subscribe, False)
+    conn.execute(insert(SubmissionDailyStat.__table__).from_select(
+        ['day', 'category', 'subscribe', 'count'],
+        select(day, category, subscribe, func.count())
+        .where(sub.c.submitted_at.isnot(None))
+        .group_by(day, category, subscribe)
+    ))
+
+
+# (表名, 列名, 升级函数)：列不存在时执行
+COLUMN_UPGRADES = [
+    ('user', 'submission_count', _add_user_submission_count),
+]
+
+# (表名, 回填函数)：表是本次新建的时候执行
+TABLE_BACKFILLS = [
+    ('submission_daily_stat', _backfill_daily_stats),
+]
+
+
+def upgrade_schema():
+    """创建缺失的表、列和索引"""
+    existing_tables = set(inspect(db.engine).get_table_names())
+    if not existing_tables and db.engine.dialect.name == 'sqlite':
+        # 新建的 SQLite 数据库：在建表之前启用 auto_vacuum=INCREMENTAL（空文件上的 VACUUM 几乎没有代价），
+        # 归档删除的记录后可以用 incremental_vacuum 归还空间
+        with db.engine.connect() as conn:
+            retention.enable_incremental_vacuum(conn)
+    db.create_all()  # 创建所有数据库表（如果不存在）
+
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table, backfill in TABLE_BACKFILLS:
+            if table not in existing_tables:
+                backfill(conn)
+        for table, column, upgrade in COLUMN_UPGRADES:
+            existing = {col['name'] for col in inspector.get_columns(table)}
+            if column not in existing:
+                upgrade(conn)
+
+    # create_all 不会给已存在的表补建索引，这里单独检查一次
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+    # 全文搜索索引（仅 SQLite）
+    if search.is_supported(db.engine):
+        with db.engine.begin() as conn:
+            search.install_fts(conn)
@@ -1,11 +1,13 @@
 # models.py
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from password_hashing import password_hasher
+from storage import RoutingSession
 from datetime import datetime
 
-# 注意：这里先声明 db，但暂时不初始化
-db = SQLAlchemy()
+# 注意：这里先声明 db，但暂时不初始化（由 storage.init_app 初始化）
+# RoutingSession 会把只读视图中的查询发到只读连接池
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model, UserMixin):
     """用户模型"""
@@ -16,22 +18,34 @@ class User(db.Model, UserMixin):
     password_hash = db.Column(db.String(256), nullable=False)
     # 新增字段：注册时间
     member_since = db.Column(db.DateTime, default=datetime.utcnow)
+    # 反范式计数：该用户的提交记录数，由 aggregates.py 在写入记录的同一事务中维护
+    submission_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     # 建立与“联系提交记录”的一对多关系
     # 'backref' 会在 ContactSubmission 模型中添加一个 `.author` 属性，指向所属用户
     submissions = db.relationship('ContactSubmission', backref='author', lazy=True)
 
     def set_password(self, password):
-        """接收明文密码，计算其哈希值并存储"""
-        self.password_hash = generate_password_hash(password)
+        """接收明文密码，计算其哈希值并存储（在哈希进程池中计算）"""
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
         """验证输入的密码是否与存储的哈希值匹配"""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """哈希参数已调整时返回 True，应在登录成功后用新参数重新哈希"""
+        return password_hasher.needs_rehash(self.password_hash)
 
     def __repr__(self):
         return f'<用户 {self.username}>'
 
 class ContactSubmission(db.Model):
+    # 复合索引：支撑按 (submitted_at, id) 倒序的游标分页，以及按用户查询自己的记录
+    __table_args__ = (
+        db.Index('ix_contact_submission_submitted_at_id', 'submitted_at', 'id'),
+        db.Index('ix_contact_submission_user_id_submitted_at', 'user_id', 'submitted_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), nullable=False)
@@ -59,3 +73,74 @@ class ContactSubmission(db.Model):
             'subscribe': self.subscribe,
             'submitted_at': self.submitted_at.isoformat() if self.submitted_at else None
         }
+
+
+class ContactSubmissionArchive(db.Model):
+    """
+    归档的提交记录：超过保留期的记录由 retention.py 从 contact_submission 移到这里，
+    热表只保留近期数据，列表查询和索引的工作集不会随历史增长。
+    也可以通过 SUBMISSION_ARCHIVE_DB 把这张表放到单独的 SQLite 文件中。
+    """
+    __tablename__ = 'contact_submission_archive'
+
+    # 热表没有使用 AUTOINCREMENT，原来的 ID 在记录被删除后可能被复用，所以归档表另设主键
+    archive_id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
+    category = db.Column(db.String(50))
+    message = db.Column(db.Text, nullable=False)
+    subscribe = db.Column(db.Boolean)
+    submitted_at = db.Column(db.DateTime, index=True)
+    user_id = db.Column(db.Integer, nullable=True, index=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+
+class IdBlock(db.Model):
+    """
+    ID 号段表：每个表一行，记录下一个可分配的 ID。
+    写后缓冲（write-behind）模式下，各个 worker 从这里按号段预留 ID，
+    这样记录还没写入数据库时就能把 ID 返回给调用方。
+    """
+    name = db.Column(db.String(64), primary_key=True)
+    next_id = db.Column(db.Integer, nullable=False)
+
+
+class SubmissionDailyStat(db.Model):
+    """
+    提交记录统计汇总表：按 (日期, 类型, 是否订阅) 记录条数。
+    由 aggregates.py 在写入/删除记录的同一事务中增量维护，
+    统计接口只需读取这张小表，不用扫描所有提交记录。
+    """
+    day = db.Column(db.Date, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    subscribe = db.Column(db.Boolean, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SubmissionChange(db.Model):
+    """
+    提交记录的变更日志（只追加）：每新增或删除一条记录写一行，与记录本身在同一事务中写入。
+    /api/submissions/changes 按 seq 增量读取，页面只需要拉取变化的部分，而不是重新加载整个列表。
+    AUTOINCREMENT 保证清理旧日志后 seq 也不会被重复使用。
+    """
+    __table_args__ = (
+        db.Index('ix_submission_change_user_id_seq', 'user_id', 'seq'),
+        {'sqlite_autoincrement': True},
+    )
+
+    seq = db.Column(db.Integer, primary_key=True)
+    op = db.Column(db.String(8), nullable=False)  # 'insert' 或 'delete'
+    submission_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class TableVersion(db.Model):
+    """
+    表的修改版本号：每次写入数据都在同一事务中把 version 加一。
+    用于生成 HTTP 的 ETag/Last-Modified，只需一次主键查询就能判断数据是否变化。
+    """
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, nullable=True)
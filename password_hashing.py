@@ -0,0 +1,143 @@
+# password_hashing.py
+"""
+密码哈希子系统。
+
+scrypt 每次计算都要消耗几十毫秒的 CPU，直接在请求线程里调用会卡住同步 worker。
+这里把哈希计算交给一个有界的进程池：
+- 并发上限：同时最多 max_concurrency 个哈希任务，超出的请求排队，
+  排队超过 queue_timeout 秒直接失败（HashingBusyError），不会无限堆积
+- 哈希参数可配置，也可以按目标耗时自动校准
+- 参数变化后，用户下次登录成功时透明地用新参数重新哈希
+
+进程池在 gthread worker 的请求线程中按需创建，此时其他线程可能正持有锁，
+直接 fork 出的子进程会继承这些锁的状态而死锁，所以子进程用 forkserver 启动。
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# 校准时依次尝试的 scrypt 成本参数 N（越大越慢越安全）
+SCRYPT_COST_CANDIDATES = [2 ** 14, 2 ** 15, 2 ** 16, 2 ** 17]
+
+
+class HashingBusyError(RuntimeError):
+    """哈希任务排队超时：服务器繁忙"""
+
+
+class PasswordHasher:
+    """有界进程池上的密码哈希服务，用法和 db 一样：先创建，再 init_app"""
+
+    def __init__(self):
+        self.method = 'scrypt'
+        self.max_workers = 0
+        self.queue_timeout = 5.0
+        self._semaphore = threading.BoundedSemaphore(1)
+        self._executor = None
+        self._pid = None
+        self.method_prefix = None
+        self._lock = threading.Lock()
+        # 统计信息
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def init_app(self, app):
+        """
+        读取配置：
+        PASSWORD_HASH_METHOD     werkzeug 的哈希方法，如 scrypt:32768:8:1
+        PASSWORD_HASH_TARGET_MS  设置后按该目标耗时校准 scrypt 参数（覆盖 METHOD）
+        PASSWORD_HASH_WORKERS    进程池大小，0 表示在请求线程内直接计算
+        PASSWORD_HASH_CONCURRENCY 同时执行的哈希任务上限
+        PASSWORD_HASH_QUEUE_TIMEOUT 排队等待的最长秒数
+        """
+        self.max_workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+        concurrency = app.config.get('PASSWORD_HASH_CONCURRENCY') or max(self.max_workers, 1)
+        self._semaphore = threading.BoundedSemaphore(concurrency)
+        self.queue_timeout = app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5.0)
+        target_ms = app.config.get('PASSWORD_HASH_TARGET_MS')
+        if target_ms:
+            self.method = calibrate_scrypt(target_ms)
+        else:
+            self.method = app.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+        # werkzeug 会把默认参数展开写进哈希前缀，直接生成一次拿到完整写法；
+        # 在这里算好，之后读取它（包括 stats()）不需要再计算一次哈希
+        self.method_prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        app.extensions['password_hasher'] = self
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """已存储的哈希是否使用了和当前配置不同的参数"""
+        return password_hash.split('$', 1)[0] != self.method_prefix
+
+    def _run(self, func, *args):
+        with self._lock:
+            self.waiting += 1
+        acquired = self._semaphore.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.rejected += 1
+            else:
+                self.in_flight += 1
+        if not acquired:
+            raise HashingBusyError('密码校验服务繁忙，请稍后重试')
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                return func(*args)
+            return executor.submit(func, *args).result()
+        finally:
+            self._semaphore.release()
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+    def _get_executor(self):
+        if self.max_workers <= 0:
+            return None
+        # 进程池不能跨 fork 使用，每个 gunicorn worker 各自创建
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers, mp_context=multiprocessing.get_context('forkserver'))
+                    self._pid = os.getpid()
+        return self._executor
+
+    def stats(self):
+        with self._lock:
+            return {
+                'method': self.method_prefix,
+                'max_workers': self.max_workers,
+                'in_flight': self.in_flight,
+                'queue_depth': self.waiting,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+
+def calibrate_scrypt(target_ms, r=8, p=1):
+    """在当前机器上测量，选出耗时不超过 target_ms 的最大 scrypt 成本参数"""
+    chosen = SCRYPT_COST_CANDIDATES[0]
+    for n in SCRYPT_COST_CANDIDATES:
+        method = f'scrypt:{n}:{r}:{p}'
+        start = time.perf_counter()
+        generate_password_hash('calibration', method)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms > target_ms:
+            break
+        chosen = n
+    return f'scrypt:{chosen}:{r}:{p}'
+
+
+password_hasher = PasswordHasher()
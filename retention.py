@@ -0,0 +1,111 @@
+# retention.py
+"""
+提交记录的保留策略：把超过保留期的记录从热表移到归档表，并清理旧的变更日志。
+
+- 归档表（contact_submission_archive）可以在同一个数据库中，
+  也可以放在单独的 SQLite 文件中（ATTACH 挂载），这样主库文件不会随历史增长。
+- 每批记录在单独的事务中完成“复制到归档表 + 从热表删除”，不会长时间持有写锁，
+  在线的请求只需要等待一批的时间。
+- 删除后用 incremental_vacuum 把空闲页还给文件系统（需要 auto_vacuum=INCREMENTAL）。
+
+通过 `flask --app app archive-submissions` 执行，适合放在 cron 中每天运行一次。
+"""
+from datetime import datetime
+
+from sqlalchemy import MetaData, delete, func, insert, literal, select
+
+from aggregates import delete_submissions
+from models import ContactSubmission, ContactSubmissionArchive, SubmissionChange
+
+ARCHIVE_SCHEMA = 'archive'
+
+# PRAGMA auto_vacuum 的返回值
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def attach_archive(connection, path):
+    """把单独的归档文件挂载到 connection 上，返回其中的归档表（不存在时创建）"""
+    connection.exec_driver_sql(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (path,))
+    table = ContactSubmissionArchive.__table__.to_metadata(MetaData(), schema=ARCHIVE_SCHEMA)
+    table.create(connection, checkfirst=True)
+    connection.commit()
+    return table
+
+
+def detach_archive(connection):
+    connection.rollback()
+    connection.exec_driver_sql(f'DETACH DATABASE {ARCHIVE_SCHEMA}')
+    connection.commit()
+
+
+def archive_submissions(connection, cutoff, chunk_size=1000, archive_table=None, on_chunk=None):
+    """
+    把 submitted_at 早于 cutoff 的记录按时间顺序分批移到归档表，返回移动的记录数。
+    on_chunk(已移动的总数) 在每批提交后调用，用于输出进度。
+    """
+    table = ContactSubmission.__table__
+    if archive_table is None:
+        archive_table = ContactSubmissionArchive.__table__
+    columns = [column.name for column in table.columns]
+    total = 0
+    while True:
+        with connection.begin():
+            # 走 (submitted_at, id) 索引，每批只扫描要移动的这些行
+            ids = connection.execute(
+                select(table.c.id)
+                .where(table.c.submitted_at < cutoff)
+                .order_by(table.c.submitted_at, table.c.id)
+                .limit(chunk_size)
+            ).scalars().all()
+            if not ids:
+                break
+            connection.execute(insert(archive_table).from_select(
+                columns + ['archived_at'],
+                select(*table.columns, literal(datetime.utcnow(), archive_table.c.archived_at.type))
+                .where(table.c.id.in_(ids))
+            ))
+            removed = delete_submissions(connection, table.c.id.in_(ids), archived=True)
+        total += len(removed)
+        if on_chunk:
+            on_chunk(total)
+    return total
+
+
+def prune_change_log(connection, before):
+    """
+    删除 before 之前的变更日志，返回删除的条数。
+    始终保留最新的一条，这样高水位（MAX(seq)）不会倒退，客户端手里的游标仍然有效。
+    """
+    table = SubmissionChange.__table__
+    with connection.begin():
+        newest = connection.execute(select(func.max(table.c.seq))).scalar()
+        if newest is None:
+            return 0
+        return connection.execute(
+            delete(table).where(table.c.changed_at < before, table.c.seq < newest)
+        ).rowcount
+
+
+def incremental_vacuum(connection):
+    """
+    归还数据库文件中的空闲页（仅 SQLite）。
+    返回 (释放的页数, auto_vacuum 是否为 INCREMENTAL)；不是 INCREMENTAL 时什么也不做。
+    """
+    mode = connection.exec_driver_sql('PRAGMA auto_vacuum').scalar()
+    free_pages = connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+    if mode != AUTO_VACUUM_INCREMENTAL:
+        connection.commit()
+        return 0, False
+    connection.commit()
+    # 每执行一步只释放一页；sqlite3 的 execute() 只执行第一步，executescript() 会执行到结束
+    connection.connection.dbapi_connection.executescript('PRAGMA incremental_vacuum')
+    freed = free_pages - connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+    connection.commit()
+    return freed, True
+
+
+def enable_incremental_vacuum(connection):
+    """把已有数据库切换为 auto_vacuum=INCREMENTAL（需要一次完整的 VACUUM，会重写整个文件）"""
+    connection.exec_driver_sql('PRAGMA auto_vacuum=INCREMENTAL')
+    connection.exec_driver_sql('VACUUM')
+    connection.commit()
@@ -0,0 +1,116 @@
+# search.py
+"""
+基于 SQLite FTS5 的提交记录全文搜索。
+
+contact_submission_fts 是一个外部内容（external content）索引：
+只保存倒排索引，原文仍在 contact_submission 表里，由触发器保持同步。
+使用 trigram 分词器，中文留言也能按任意子串搜索（每个搜索词至少 3 个字符）。
+"""
+from markupsafe import escape
+from sqlalchemy import column, func, literal_column, table, text
+
+from models import db, ContactSubmission
+
+FTS_TABLE = 'contact_submission_fts'
+MIN_TERM_LENGTH = 3  # trigram 分词器无法匹配少于 3 个字符的词
+
+# 片段高亮用的临时标记，HTML 转义后再替换成 <mark>
+_HIGHLIGHT_START = '\x02'
+_HIGHLIGHT_END = '\x03'
+
+FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, email, message,
+        content='contact_submission', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON contact_submission BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, email, message)
+        VALUES (new.id, new.name, new.email, new.message);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON contact_submission BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, email, message)
+        VALUES ('delete', old.id, old.name, old.email, old.message);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON contact_submission BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, email, message)
+        VALUES ('delete', old.id, old.name, old.email, old.message);
+        INSERT INTO {FTS_TABLE}(rowid, name, email, message)
+        VALUES (new.id, new.name, new.email, new.message);
+    END""",
+]
+
+
+def is_supported(engine):
+    return engine.dialect.name == 'sqlite'
+
+
+def install_fts(conn):
+    """创建 FTS5 索引和同步触发器；索引是新建的话，用现有数据填充"""
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first()
+    for ddl in FTS_DDL:
+        conn.execute(text(ddl))
+    if not exists:
+        rebuild_fts(conn)
+
+
+def rebuild_fts(conn):
+    """根据 contact_submission 表重建整个全文索引"""
+    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+class SearchQueryError(ValueError):
+    """搜索词不合法"""
+
+
+def build_match_query(q):
+    """
+    把用户输入转换成 FTS5 的 MATCH 表达式：按空白拆分成多个词，
+    每个词加双引号作为短语（避免 AND/OR/* 等被当成语法），多个词之间为 AND。
+    """
+    terms = q.split()
+    if not terms:
+        raise SearchQueryError('搜索词不能为空')
+    short = [term for term in terms if len(term) < MIN_TERM_LENGTH]
+    if short:
+        raise SearchQueryError(f'每个搜索词至少需要 {MIN_TERM_LENGTH} 个字符: {" ".join(short)}')
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def _highlight(snippet):
+    """转义片段中的 HTML，再把高亮标记替换成 <mark>"""
+    html = str(escape(snippet))
+    return html.replace(_HIGHLIGHT_START, '<mark>').replace(_HIGHLIGHT_END, '</mark>')
+
+
+def search_submissions(q, limit=20, offset=0):
+    """
+    按 bm25 相关度排序搜索提交记录。
+    返回 (结果列表, 下一页 offset 或 None)，每条结果是 to_dict() 加上 snippet 和 rank。
+    """
+    match = build_match_query(q)
+    fts = table(FTS_TABLE, column('rowid'))
+    fts_ref = literal_column(FTS_TABLE)
+    rank = func.bm25(fts_ref)
+    snippet = func.snippet(fts_ref, -1, _HIGHLIGHT_START, _HIGHLIGHT_END, '…', 16)
+
+    rows = (
+        db.session.query(ContactSubmission, snippet, rank)
+        .join(fts, fts.c.rowid == ContactSubmission.id)
+        .filter(fts_ref.op('MATCH')(match))
+        .order_by(rank, ContactSubmission.id)
+        .limit(limit + 1)
+        .offset(offset)
+        .all()
+    )
+    next_offset = offset + limit if len(rows) > limit else None
+
+    results = []
+    for sub, snippet_text, score in rows[:limit]:
+        item = sub.to_dict()
+        item['snippet'] = _highlight(snippet_text)
+        item['rank'] = score
+        results.append(item)
+    return results, next_offset
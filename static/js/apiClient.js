@@ -1,5 +1,9 @@
 // API客户端模块 - 统一管理所有后端API调用
 const ApiClient = {
+    // GET 响应的验证器缓存：endpoint -> { etag, data }，用于条件请求
+    _etagCache: new Map(),
+    _etagCacheSize: 50,
+
     // 通用请求方法
     async _request(endpoint, options = {}, retries = 2) {
     const defaultOptions = {
@@ -9,6 +13,14 @@ const ApiClient = {
     };
     
     const mergedOptions = { ...defaultOptions, ...options };
+    mergedOptions.headers = { ...defaultOptions.headers, ...options.headers };
+
+    // GET 请求带上上次的 ETag，数据没变时服务器返回 304，直接使用缓存的数据
+    const isGet = !mergedOptions.method || mergedOptions.method.toUpperCase() === 'GET';
+    const cached = isGet ? this._etagCache.get(endpoint) : null;
+    if (cached) {
+        mergedOptions.headers['If-None-Match'] = cached.etag;
+    }
     
     for (let attempt = 0; attempt <= retries; attempt++) {
         try {
@@ -22,8 +34,33 @@ const ApiClient = {
             });
             
             clearTimeout(timeoutId);
+
+            // 服务器过载时（429 限流 / 503 繁忙）请求没有被处理，按 Retry-After 指定的时间等待后重试
+            if ((response.status === 429 || response.status === 503) && attempt < retries) {
+                const retryAfter = this._retryAfterMs(response);
+                if (retryAfter !== null) {
+                    await this._delay(retryAfter);
+                    continue;
+                }
+            }
+
+            if (response.status === 304 && cached) {
+                return {
+                    ok: true,
+                    status: 304,
+                    data: cached.data,
+                    response: response,
+                    notModified: true,
+                    retried: attempt > 0
+                };
+            }
             
             const data = await response.json();
+
+            const etag = response.headers.get('ETag');
+            if (isGet && response.ok && etag) {
+                this._rememberEtag(endpoint, etag, data);
+            }
             
             return {
                 ok: response.ok,
@@ -55,6 +92,26 @@ const ApiClient = {
     }
 },
 
+// 辅助函数：记录 ETag 和对应的数据，超过上限时淘汰最早的一条
+_rememberEtag(endpoint, etag, data) {
+    this._etagCache.delete(endpoint);
+    this._etagCache.set(endpoint, { etag, data });
+    if (this._etagCache.size > this._etagCacheSize) {
+        this._etagCache.delete(this._etagCache.keys().next().value);
+    }
+},
+
+// 辅助函数：解析 Retry-After（秒数或 HTTP 日期），返回毫秒；没有或超过 60 秒时返回 null（不再自动重试）
+_retryAfterMs(response) {
+    const header = response.headers.get('Retry-After');
+    if (!header) return null;
+    const seconds = /^\d+$/.test(header.trim())
+        ? parseInt(header, 10)
+        : (Date.parse(header) - Date.now()) / 1000;
+    if (!Number.isFinite(seconds) || seconds > 60) return null;
+    return Math.max(0, seconds) * 1000;
+},
+
 // 辅助函数：延迟
 _delay(ms) {
     return new Promise(resolve => setTimeout(resolve, ms));
@@ -68,9 +125,94 @@ _delay(ms) {
         });
     },
     
-    // 获取所有记录
-    async getSubmissions() {
-        return this._request('/api/submissions');
+    // 分页获取记录
+    // options: { limit: 每页条数, cursor: 上一页返回的 next_cursor, count: 'exact' | 'estimate', mine: 只看自己的记录 }
+    async getSubmissions(options = {}) {
+        const params = new URLSearchParams();
+        if (options.limit) params.set('limit', options.limit);
+        if (options.cursor) params.set('cursor', options.cursor);
+        if (options.count) params.set('count', options.count);
+        if (options.mine) params.set('mine', '1');
+        const query = params.toString();
+        return this._request(query ? `/api/submissions?${query}` : '/api/submissions');
+    },
+    
+    // 长轮询获取增量变更
+    // options: { since: 变更游标, mine: 只看自己的记录, timeout: 服务器最长等待秒数 }
+    async getChanges(options = {}) {
+        const params = new URLSearchParams();
+        if (options.since != null) params.set('since', options.since);
+        if (options.mine) params.set('mine', '1');
+        if (options.timeout != null) params.set('timeout', options.timeout);
+        // 客户端超时要比服务器的等待时间长；长轮询失败由调用方决定何时重试
+        const timeout = ((options.timeout ?? 25) + 10) * 1000;
+        return this._request(`/api/submissions/changes?${params}`, { timeout }, 0);
+    },
+
+    // 订阅增量变更：优先使用 SSE（EventSource），浏览器不支持或服务器繁忙（503）时退回轮询
+    // options: { since: 列表第一页返回的 changes_cursor, mine: 只看自己的记录 }
+    // handlers: { onChanges(changes): 收到一批变更, onReset(): 游标失效，需要重新加载整个列表 }
+    // 返回取消订阅的函数
+    watchChanges(options, handlers) {
+        const params = new URLSearchParams({ since: options.since });
+        if (options.mine) params.set('mine', '1');
+
+        let stopped = false;
+        let source = null;
+        let since = options.since;
+        const poll = async () => {
+            while (!stopped) {
+                const result = await this.getChanges({ since, mine: options.mine });
+                if (stopped) return;
+                if (result.status === 410) {
+                    handlers.onReset();
+                    return;
+                }
+                if (!result.ok) {
+                    await this._delay(5000);
+                    continue;
+                }
+                since = result.data.cursor;
+                if (result.data.changes.length) handlers.onChanges(result.data.changes);
+                // 服务器没有空闲的名额时不会挂起请求，按它给出的间隔再来取
+                if (result.data.retry_after) await this._delay(result.data.retry_after * 1000);
+            }
+        };
+
+        if ('EventSource' in window) {
+            source = new EventSource(`/api/submissions/changes/stream?${params}`);
+            source.addEventListener('changes', event => {
+                since = Number(event.lastEventId);
+                handlers.onChanges(JSON.parse(event.data));
+            });
+            source.onerror = () => {
+                // 网络中断时 EventSource 会自动重连；连接被拒绝（503 繁忙、410 游标失效等）时不会再重连，
+                // 改为从最后收到的游标开始轮询（游标失效时轮询会收到 410 并重新加载列表）
+                if (source.readyState === EventSource.CLOSED && !stopped) poll();
+            };
+        } else {
+            poll();
+        }
+        return () => {
+            stopped = true;
+            if (source) source.close();
+        };
+    },
+
+    // 把增量变更原地应用到已渲染的表格：删除对应的行，新增的记录插到最前面（已存在的行直接替换）
+    // 表格的每一行需要带 data-id 属性，buildRow(sub) 负责根据一条记录生成一行
+    applyChanges(tbody, changes, buildRow) {
+        changes.forEach(change => {
+            const id = change.op === 'delete' ? change.id : change.data.id;
+            const existing = tbody.querySelector(`tr[data-id="${id}"]`);
+            if (change.op === 'delete') {
+                if (existing) existing.remove();
+            } else if (existing) {
+                existing.replaceWith(buildRow(change.data));
+            } else {
+                tbody.insertBefore(buildRow(change.data), tbody.firstChild);
+            }
+        });
     },
     
     // 删除记录
@@ -80,6 +222,14 @@ _delay(ms) {
         });
     },
     
+    // 批量删除自己的记录，返回的 deleted/skipped 分别是已删除和未删除（不存在或无权删除）的ID
+    async deleteSubmissions(ids) {
+        return this._request('/api/submissions/bulk-delete', {
+            method: 'POST',
+            body: JSON.stringify({ ids })
+        });
+    },
+    
     // 获取当前用户信息（为未来功能预留）
     async getCurrentUser() {
         return this._request('/api/user/current');
@@ -111,6 +261,11 @@ const ErrorHandler = {
             return '请求的资源不存在';
         }
         
+        // 限流或过载：服务器返回的提示（包含重试时间）比通用的错误信息更有用
+        if ((status === 429 || status === 503) && data && data.message) {
+            return data.message;
+        }
+        
         if (status >= 500) {
             return '服务器内部错误，请稍后重试';
         }
@@ -0,0 +1,208 @@
+document.addEventListener('DOMContentLoaded', function () {
+    // 现在可以使用 ApiClient 代替原生的 fetch
+    async function handleFormSubmit(event) {
+        event.preventDefault();
+
+        // 使用 ApiClient
+        const result = await ApiClient.createSubmission(formData);
+
+        if (result.ok && result.data.status === 'success') {
+            // 处理成功...
+        } else {
+            // 处理错误...
+        }
+    }
+});
+
+// 当页面完全加载后执行
+document.addEventListener('DOMContentLoaded', function () {
+    console.log('contact_wtf: DOMContentLoaded');
+    const form = document.getElementById('contact-form');
+    const messageContainer = document.getElementById('form-messages');
+    const submitBtn = document.getElementById('submit-btn');
+    const loadingSpinner = document.getElementById('loading-spinner');
+
+    // 监听表单提交事件
+    form.addEventListener('submit', async function (event) {
+        // 1. 阻止表单的默认提交行为（页面刷新）
+        event.preventDefault();
+
+        // 2. 禁用提交按钮，显示加载中状态
+        submitBtn.disabled = true;
+        loadingSpinner.style.display = 'block';
+        submitBtn.textContent = '提交中...';
+
+        // 3. 清除之前的消息
+        clearMessages();
+
+        // 4. 收集表单数据
+        const formData = new FormData(form);
+        // 将FormData转换为普通对象
+        const data = {};
+        formData.forEach((value, key) => {
+            // 处理复选框
+            if (key === 'subscribe') {
+                data[key] = value === 'on'; // 将 'on' 转换为布尔值
+            } else {
+                data[key] = value;
+            }
+        });
+
+        console.log('contact_wtf: submitting', data);
+        try {
+            // 5. 发送Fetch请求到API
+            const response = await fetch('/api/submission', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify(data)
+            });
+
+            const result = await response.json();
+            console.log('contact_wtf: fetch response', response.status, result);
+
+            // 6. 处理响应
+            if (response.ok && result.status === 'success') {
+                // 成功：显示成功消息
+                showMessage('success', result.message);
+
+                // 可选：在消息中显示创建的数据详情
+                const detailMsg = `记录ID: ${result.data.id}，类型: ${result.data.category}，摘要: ${result.data.message}`;
+                showMessage('info', detailMsg);
+
+                // 清空表单（重置）
+                form.reset();
+            } else {
+                // 失败：显示错误消息
+                showMessage('error', result.message || '提交失败，请稍后重试。');
+            }
+        } catch (error) {
+            // 网络错误或其他异常
+            console.error('提交出错:', error);
+            showMessage('error', '网络错误，请检查连接后重试。');
+        } finally {
+            // 7. 恢复按钮状态
+            submitBtn.disabled = false;
+            loadingSpinner.style.display = 'none';
+            submitBtn.textContent = '提交信息';
+        }
+    });
+
+    // 显示消息的函数
+    function showMessage(type, text) {
+        const messageDiv = document.createElement('div');
+        messageDiv.className = `alert alert-${type}`;
+        messageDiv.textContent = text;
+        messageContainer.appendChild(messageDiv);
+        messageContainer.style.display = 'block';
+
+        // 如果是成功消息，5秒后自动淡出
+        if (type === 'success') {
+            setTimeout(() => {
+                messageDiv.style.opacity = '0';
+                setTimeout(() => {
+                    if (messageDiv.parentNode === messageContainer) {
+                        messageContainer.removeChild(messageDiv);
+                    }
+                    if (messageContainer.children.length === 0) {
+                        messageContainer.style.display = 'none';
+                    }
+                }, 500);
+            }, 5000);
+        }
+    }
+
+    // 清除所有消息的函数
+    function clearMessages() {
+        messageContainer.innerHTML = '';
+        messageContainer.style.display = 'none';
+    }
+});
+
+// 表单字段实时验证
+const formFields = {
+    name: { min: 2, max: 100 },
+    email: { pattern: /^[^\s@]+@[^\s@]+\.[^\s@]+$/ },
+    message: { min: 10, max: 1000 }
+};
+
+// 为每个字段添加输入监听
+// 为每个字段添加输入监听（修复：添加form存在检查）
+if (form) {  // 添加这个检查
+    Object.keys(formFields).forEach(fieldName => {
+        const field = form.querySelector(`[name="${fieldName}"]`);
+        if (field) {
+            field.addEventListener('input', function () {
+                validateField(this);
+            });
+            field.addEventListener('blur', function () {
+                validateField(this, true);
+            });
+        }
+    });
+}
+
+// 字段验证函数
+function validateField(field, showError = false) {
+    const rules = formFields[field.name];
+    const value = field.value.trim();
+    const errorElement = field.parentElement.querySelector('.field-error') ||
+        createErrorElement(field);
+
+    // 清除之前的错误状态
+    field.classList.remove('field-error-border');
+    errorElement.textContent = '';
+
+    // 验证规则
+    if (rules.required && !value) {
+        if (showError) setFieldError(field, errorElement, '此字段为必填项');
+        return false;
+    }
+
+    if (rules.min && value.length < rules.min) {
+        if (showError) setFieldError(field, errorElement, `至少需要 ${rules.min} 个字符`);
+        return false;
+    }
+
+    if (rules.max && value.length > rules.max) {
+        setFieldError(field, errorElement, `不能超过 ${rules.max} 个字符`);
+        return false;
+    }
+
+    if (rules.pattern && !rules.pattern.test(value)) {
+        if (showError) setFieldError(field, errorElement, '格式无效');
+        return false;
+    }
+
+    // 验证通过
+    field.classList.add('field-valid');
+    return true;
+}
+
+// 设置字段错误状态
+function setFieldError(field, errorElement, message) {
+    field.classList.remove('field-valid');
+    field.classList.add('field-error-border');
+    errorElement.textContent = message;
+}
+
+// 创建错误显示元素
+function createErrorElement(field) {
+    const errorEl = document.createElement('div');
+    errorEl.className = 'field-error';
+    field.parentElement.appendChild(errorEl);
+    return errorEl;
+}
+
+// 提交前的整体验证
+function validateForm() {
+    let isValid = true;
+    Object.keys(formFields).forEach(fieldName => {
+        const field = form.querySelector(`[name="${fieldName}"]`);
+        if (field && !validateField(field, true)) {
+            isValid = false;
+        }
+    });
+    return isValid;
+}
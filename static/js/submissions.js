@@ -0,0 +1,343 @@
+document.addEventListener('DOMContentLoaded', function () {
+    // 现在可以使用 ApiClient 代替原生的 fetch
+    async function handleFormSubmit(event) {
+        event.preventDefault();
+
+        // 使用 ApiClient
+        const result = await ApiClient.createSubmission(formData);
+
+        if (result.ok && result.data.status === 'success') {
+            // 处理成功...
+        } else {
+            // 处理错误...
+        }
+    }
+});
+
+document.addEventListener('DOMContentLoaded', function () {
+    const tbody = document.getElementById('submissions-tbody');
+    const tableContainer = document.getElementById('table-container');
+    const loadingState = document.getElementById('loading-state');
+    const emptyState = document.getElementById('empty-state');
+    const messagesContainer = document.getElementById('messages');
+    const refreshBtn = document.getElementById('refresh-btn');
+    const loadMoreBtn = document.getElementById('load-more-btn');
+    const sentinel = document.getElementById('load-more-sentinel');
+
+    // 分页状态
+    const PAGE_SIZE = 50;
+    let nextCursor = null;
+    let isLoadingPage = false;
+
+    // 增量变更订阅：加载第一页后开始，新增和删除的记录直接更新到表格上
+    let stopWatching = null;
+
+    // 页面加载时自动获取第一页
+    loadSubmissions();
+
+    // 点击刷新按钮从第一页重新加载
+    refreshBtn.addEventListener('click', loadSubmissions);
+    loadMoreBtn.addEventListener('click', loadNextPage);
+
+    // 滚动到表格底部时自动加载下一页
+    if ('IntersectionObserver' in window) {
+        const observer = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                loadNextPage();
+            }
+        }, { rootMargin: '200px' });
+        observer.observe(sentinel);
+    }
+
+    // 主函数：从第一页开始加载提交记录
+    async function loadSubmissions() {
+        // 刷新时如果服务器返回 304（数据没有变化），保留当前表格，不重新渲染
+        const isRefresh = tbody.children.length > 0;
+        if (!isRefresh) showLoading();
+        clearMessages();
+
+        try {
+            const result = await fetchPage(null, 'exact');
+            if (isRefresh && result.notModified) {
+                if (!stopWatching) watchChanges(result.data.changes_cursor);
+                showMessage('success', '记录没有变化');
+                return;
+            }
+            tbody.innerHTML = '';
+            updatePaging(result.data);
+            watchChanges(result.data.changes_cursor);
+            if (result.data.data.length === 0) {
+                showEmptyState();
+                return;
+            }
+            renderSubmissions(result.data.data);
+            showMessage('success', `已加载 ${result.data.count} 条记录，共 ${result.data.total} 条`);
+        } catch (error) {
+            console.error('加载记录失败:', error);
+            showMessage('error', `加载失败: ${error.message}`);
+            showEmptyState();
+        } finally {
+            hideLoading();
+        }
+    }
+
+    // 从 cursor 开始订阅增量变更（重新加载列表时先取消之前的订阅）
+    function watchChanges(cursor) {
+        if (stopWatching) stopWatching();
+        stopWatching = ApiClient.watchChanges({ since: cursor, mine: true }, {
+            onChanges: changes => {
+                ApiClient.applyChanges(tbody, changes, buildRow);
+                if (tbody.children.length === 0) {
+                    showEmptyState();
+                } else {
+                    tableContainer.style.display = 'block';
+                    emptyState.style.display = 'none';
+                }
+            },
+            onReset: () => {
+                stopWatching = null;
+                loadSubmissions();
+            }
+        });
+    }
+
+    // 加载下一页并追加到表格末尾
+    async function loadNextPage() {
+        if (!nextCursor || isLoadingPage) return;
+
+        try {
+            const result = await fetchPage(nextCursor);
+            updatePaging(result.data);
+            renderSubmissions(result.data.data);
+        } catch (error) {
+            console.error('加载下一页失败:', error);
+            showMessage('error', `加载失败: ${error.message}`);
+        }
+    }
+
+    // 请求一页数据，返回 ApiClient 的结果（notModified 表示服务器返回了 304）
+    async function fetchPage(cursor, count) {
+        isLoadingPage = true;
+        try {
+            const result = await ApiClient.getSubmissions({ limit: PAGE_SIZE, cursor, count, mine: true });
+            if (!result.ok || result.data.status !== 'success') {
+                throw new Error(ErrorHandler.getFriendlyMessage(result));
+            }
+            return result;
+        } finally {
+            isLoadingPage = false;
+        }
+    }
+
+    // 更新分页状态
+    function updatePaging(page) {
+        nextCursor = page.next_cursor;
+        loadMoreBtn.style.display = nextCursor ? 'inline-flex' : 'none';
+    }
+
+    // 渲染记录到表格（追加，不清空已有行）
+    function renderSubmissions(submissions) {
+        // 为每条记录创建表格行
+        submissions.forEach(sub => {
+            tbody.appendChild(buildRow(sub));
+        });
+
+        // 显示表格，隐藏空状态
+        tableContainer.style.display = 'block';
+        emptyState.style.display = 'none';
+    }
+
+    // 根据一条记录生成表格行
+    function buildRow(sub) {
+        const row = document.createElement('tr');
+        row.dataset.id = sub.id;
+
+        // 格式化日期
+        const submittedDate = new Date(sub.submitted_at);
+        const formattedDate = submittedDate.toLocaleDateString('zh-CN') + ' ' +
+            submittedDate.toLocaleTimeString('zh-CN', {
+                hour: '2-digit',
+                minute: '2-digit'
+            });
+
+        // 创建行内容
+        row.innerHTML = `
+            <td>#${sub.id}</td>
+            <td>${escapeHtml(sub.name)}</td>
+            <td><code>${escapeHtml(sub.email)}</code></td>
+            <td><span class="category-badge ${sub.category}">${getCategoryText(sub.category)}</span></td>
+            <td title="${escapeHtml(sub.message)}">${truncateText(sub.message, 50)}</td>
+            <td>${sub.subscribe ? '✓' : '✗'}</td>
+            <td><small>${formattedDate}</small></td>
+            <td class="actions">
+                <button class="btn-danger delete-btn" data-id="${sub.id}" 
+                        onclick="deleteSubmission(${sub.id}, this)">
+                    删除
+                </button>
+            </td>
+        `;
+        return row;
+    }
+
+    // 全局删除函数（因为需要在动态生成的按钮上使用）
+    window.deleteSubmission = async function (id, buttonElement) {
+        const row = buttonElement.closest('tr');
+        const rowData = {
+            id: id,
+            html: row.innerHTML,
+            element: row
+        };
+
+        // 临时隐藏行（而不是立即删除）
+        row.style.opacity = '0.5';
+        row.style.backgroundColor = '#fff3cd';
+
+        // 创建撤销按钮
+        const undoButton = document.createElement('button');
+        undoButton.className = 'btn-warning undo-btn';
+        undoButton.innerHTML = '↶ 撤销删除';
+        undoButton.style.marginLeft = '0.5rem';
+
+        // 替换原始删除按钮
+        const actionsCell = buttonElement.parentElement;
+        actionsCell.innerHTML = '';
+        actionsCell.appendChild(undoButton);
+
+        // 设置撤销超时（7秒后真正删除）
+        const undoTimeout = setTimeout(() => {
+            performDelete(id, row);
+        }, 7000);
+
+        // 撤销按钮事件
+        undoButton.onclick = function () {
+            clearTimeout(undoTimeout);
+
+            // 恢复行
+            row.style.opacity = '1';
+            row.style.backgroundColor = '';
+            row.innerHTML = rowData.html;
+
+            // 重新绑定删除事件到恢复的按钮
+            const newDeleteBtn = row.querySelector('.delete-btn');
+            if (newDeleteBtn) {
+                newDeleteBtn.onclick = function () {
+                    deleteSubmission(id, newDeleteBtn);
+                };
+            }
+
+            ErrorHandler.showSuccess('删除已取消');
+        };
+
+        // 显示撤销提示
+        const message = `记录 #${id} 已标记删除。7秒后生效。`;
+        ErrorHandler.showInfo(message, 7000);
+    };
+
+    // 实际执行删除的函数
+    async function performDelete(id, row) {
+        try {
+            const result = await ApiClient.deleteSubmission(id);
+
+            if (result.ok && result.data.status === 'success') {
+                // 平滑删除动画
+                row.style.transition = 'all 0.3s ease';
+                row.style.height = row.offsetHeight + 'px';
+
+                setTimeout(() => {
+                    row.style.height = '0';
+                    row.style.opacity = '0';
+                    row.style.padding = '0';
+                    row.style.margin = '0';
+                    row.style.border = 'none';
+                }, 10);
+
+                setTimeout(() => {
+                    if (row.parentNode) {
+                        row.parentNode.removeChild(row);
+                    }
+
+                    // 检查是否还有记录
+                    if (tbody.children.length === 0) {
+                        showEmptyState();
+                    }
+                }, 400);
+
+                ErrorHandler.showSuccess(result.data.message);
+            } else {
+                throw new Error(ErrorHandler.getFriendlyMessage(result));
+            }
+        } catch (error) {
+            console.error('删除失败:', error);
+            ErrorHandler.showError(`删除失败: ${error.message}`);
+
+            // 恢复行
+            row.style.opacity = '1';
+            row.style.backgroundColor = '';
+        }
+    };
+
+    // 工具函数：显示加载状态
+    function showLoading() {
+        loadingState.style.display = 'block';
+        tableContainer.style.display = 'none';
+        emptyState.style.display = 'none';
+    }
+
+    function hideLoading() {
+        loadingState.style.display = 'none';
+    }
+
+    // 工具函数：显示空状态
+    function showEmptyState() {
+        tableContainer.style.display = 'none';
+        emptyState.style.display = 'block';
+    }
+
+    // 工具函数：显示消息
+    function showMessage(type, text) {
+        const messageDiv = document.createElement('div');
+        messageDiv.className = `alert alert-${type}`;
+        messageDiv.textContent = text;
+        messagesContainer.appendChild(messageDiv);
+        messagesContainer.style.display = 'block';
+
+        // 5秒后自动移除（成功消息）
+        if (type === 'success') {
+            setTimeout(() => {
+                messageDiv.remove();
+                if (messagesContainer.children.length === 0) {
+                    messagesContainer.style.display = 'none';
+                }
+            }, 5000);
+        }
+    }
+
+    function clearMessages() {
+        messagesContainer.innerHTML = '';
+        messagesContainer.style.display = 'none';
+    }
+
+    // 工具函数：截断文本
+    function truncateText(text, maxLength) {
+        if (text.length <= maxLength) return escapeHtml(text);
+        return escapeHtml(text.substring(0, maxLength)) + '...';
+    }
+
+    // 工具函数：HTML转义（防止XSS）
+    function escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML;
+    }
+
+    // 工具函数：获取类型文本
+    function getCategoryText(category) {
+        const map = {
+            'general': '一般',
+            'technical': '技术',
+            'feedback': '反馈',
+            'other': '其他'
+        };
+        return map[category] || category;
+    }
+});
@@ -0,0 +1,147 @@
+# storage.py
+"""
+数据库存储配置：连接参数、连接池和读写分离。
+
+- SQLite：每个新连接都通过 PRAGMA 设置 WAL、busy_timeout、synchronous 等参数（由 DATABASE_PROFILE 选择），
+  WAL 模式下读不阻塞写，多个 gunicorn worker 并发写入时也会等待锁而不是立即报 "database is locked"。
+- 连接池：每个 worker 进程一个连接池，大小、超时、回收时间可配置。
+- 只读视图（用 @read_only 标记）走单独的只读连接池：
+  SQLite 打开同一个文件并设置 query_only；服务器数据库可以通过 DATABASE_READ_URL 指向只读副本。
+- 把 DATABASE_URL 换成 postgresql://... 等地址即可切换到服务器数据库，不需要改代码。
+"""
+from functools import wraps
+
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# 只读连接池在 SQLALCHEMY_BINDS 中的名字（它没有对应的表，create_all 不会处理它）
+READ_BIND = 'readonly'
+
+# 存储方案：每个新的 SQLite 连接上执行的 PRAGMA；None 表示使用配置中的值
+PROFILES = {
+    # 生产环境：WAL + NORMAL 同步（只在检查点时 fsync），读写互不阻塞
+    'wal': {
+        # busy_timeout 放在最前面：后面修改 journal_mode 时如果遇到锁也会等待
+        'busy_timeout': None,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': None,
+        'cache_size': None,
+        'temp_store': 'MEMORY',
+    },
+    # 保持 SQLite 的默认设置，只加上等锁超时
+    'default': {
+        'busy_timeout': None,
+    },
+}
+
+
+def is_memory_sqlite(url):
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and (
+        url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory')
+
+
+class RoutingSession(Session):
+    """
+    在只读视图中把查询路由到只读连接池。
+    flush（写入）始终使用主连接池，所以只读视图里意外的写操作也不会发到只读连接上。
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('db_read_only'):
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_only(view):
+    """视图装饰器：本次请求中的查询使用只读连接池"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class Storage:
+    def init_app(self, app, db):
+        """
+        根据配置设置引擎参数和只读连接池，然后初始化 db。
+        必须代替 db.init_app(app) 调用，因为引擎在 db.init_app 时就会创建。
+        """
+        uri = app.config['SQLALCHEMY_DATABASE_URI']
+        # 兼容部分托管平台提供的 postgres:// 写法
+        if uri.startswith('postgres://'):
+            uri = app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://' + uri[len('postgres://'):]
+        backend = make_url(uri).get_backend_name()
+
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        if not is_memory_sqlite(uri):
+            # 内存数据库使用 StaticPool（单个连接），不能设置连接池参数
+            options.setdefault('pool_size', app.config['DATABASE_POOL_SIZE'])
+            options.setdefault('max_overflow', app.config['DATABASE_MAX_OVERFLOW'])
+            options.setdefault('pool_timeout', app.config['DATABASE_POOL_TIMEOUT'])
+            if backend != 'sqlite':
+                # 服务器数据库的连接可能被服务端或网络设备断开
+                options.setdefault('pool_recycle', app.config['DATABASE_POOL_RECYCLE'])
+                options.setdefault('pool_pre_ping', True)
+
+            read_url = app.config.get('DATABASE_READ_URL') or uri
+            read_options = dict(options, url=read_url)
+            if backend == 'postgresql':
+                # 即使没有配置只读副本，也让数据库拒绝只读连接上的写操作
+                read_options['execution_options'] = {'postgresql_readonly': True}
+            app.config.setdefault('SQLALCHEMY_BINDS', {}).setdefault(READ_BIND, read_options)
+
+        db.init_app(app)
+
+        if backend == 'sqlite':
+            pragmas = self.sqlite_pragmas(app)
+            with app.app_context():
+                for key, engine in db.engines.items():
+                    self._install_pragmas(engine, pragmas, query_only=key == READ_BIND)
+        app.extensions['storage'] = self
+
+    def sqlite_pragmas(self, app):
+        profile = app.config['DATABASE_PROFILE']
+        if profile not in PROFILES:
+            raise ValueError(f'未知的 DATABASE_PROFILE: {profile}（可选：{", ".join(PROFILES)}）')
+        configured = {
+            'busy_timeout': app.config['SQLITE_BUSY_TIMEOUT_MS'],
+            'mmap_size': app.config['SQLITE_MMAP_SIZE'],
+            # 负数表示以 KiB 为单位
+            'cache_size': -app.config['SQLITE_CACHE_SIZE_KB'],
+        }
+        return {name: configured[name] if value is None else value
+                for name, value in PROFILES[profile].items()}
+
+    def _install_pragmas(self, engine, pragmas, query_only=False):
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                # query_only 要最后设置，之后就不能再修改 journal_mode 了
+                for name, value in pragmas.items():
+                    cursor.execute(f'PRAGMA {name}={value}')
+                if query_only:
+                    cursor.execute('PRAGMA query_only=ON')
+            finally:
+                cursor.close()
+
+    def pool_stats(self, db):
+        """各连接池当前的使用情况（需要应用上下文）"""
+        stats = {}
+        for key, engine in db.engines.items():
+            pool = engine.pool
+            name = key or 'primary'
+            if hasattr(pool, 'checkedout'):
+                stats[f'{name}_checked_out'] = pool.checkedout()
+                stats[f'{name}_pool_size'] = pool.size()
+        return stats
+
+
+storage = Storage()
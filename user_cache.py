@@ -0,0 +1,137 @@
+# user_cache.py
+"""
+Flask-Login 用户加载缓存。
+
+每个已登录请求都会调用 user_loader，原来每次都要执行一条 SQL。
+这里在每个 worker 进程内缓存一份轻量的用户快照（不是 ORM 对象），
+并通过 SQLAlchemy 会话事件在 User 行提交修改后自动失效。
+其他 worker 的修改无法通知到本进程，只能依靠 TTL 过期。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+from models import db, User
+
+
+class CachedUser:
+    """
+    用户快照：只保存页面和权限判断需要的字段，不持有数据库会话。
+    UserMixin 没有定义 __slots__，继承它的实例仍然会有 __dict__，
+    所以这里直接实现 Flask-Login 需要的几个属性。
+    """
+    __slots__ = ('id', 'username', 'email', 'member_since')
+
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, id, username, email, member_since):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.member_since = member_since
+
+    @classmethod
+    def from_model(cls, user):
+        return cls(user.id, user.username, user.email, user.member_since)
+
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, (CachedUser, User)) and self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<用户快照 {self.username}>'
+
+
+class UserCache:
+    """带 TTL 的 LRU 缓存，按用户ID保存 CachedUser"""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # user_id -> (过期时间, CachedUser)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id):
+        """返回用户快照；缓存未命中时查询数据库，用户不存在返回 None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = CachedUser.from_model(user)
+        with self._lock:
+            self._data[user_id] = (now + self.ttl, snapshot)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._data.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def configure(self, maxsize, ttl):
+        """调整容量和过期时间（由 create_app 根据配置调用），同时清空已有内容"""
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self._data.clear()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / total, 4) if total else None,
+            }
+
+
+def install_invalidation(cache, session=db.session):
+    """
+    监听会话事件：flush 时记下被修改的 User，事务提交后再让缓存失效。
+    （回滚的修改不会影响缓存）
+    """
+    @event.listens_for(session, 'after_flush')
+    def _collect_changed_users(sess, flush_context):
+        changed = sess.info.setdefault('changed_user_ids', set())
+        for obj in list(sess.new) + list(sess.dirty) + list(sess.deleted):
+            if isinstance(obj, User) and obj.id is not None:
+                changed.add(obj.id)
+
+    @event.listens_for(session, 'after_commit')
+    def _invalidate_changed_users(sess):
+        for user_id in sess.info.pop('changed_user_ids', ()):
+            cache.invalidate(user_id)
+
+    @event.listens_for(session, 'after_rollback')
+    def _discard_changed_users(sess):
+        sess.info.pop('changed_user_ids', None)
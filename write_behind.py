@@ -0,0 +1,210 @@
+# write_behind.py
+"""
+写后缓冲（write-behind）提交队列。
+
+请求线程只把记录放进进程内队列，由后台线程每隔 N 毫秒或每攒够 M 条
+合并成一个事务写入数据库（group commit），避免每个请求都单独提交、
+在 SQLite 的写锁上排队。
+
+两种持久化级别：
+- 'fsync'：记录所在的批次提交成功后才返回（多个请求共享一次提交）
+- 'ack'  ：放入队列后立即返回，由后台线程稍后写入（进程崩溃可能丢失未写入的记录）
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, IdBlock
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MODES = ('fsync', 'ack')
+
+
+class IdBlockAllocator:
+    """按号段预留 ID：每次从 id_block 表中取走 block_size 个，用完再取"""
+
+    def __init__(self, app, model, block_size=64):
+        self.app = app
+        self.model = model
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0  # 当前号段的上界（不含）
+
+    def next_id(self):
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = self._reserve_block()
+            allocated = self._next
+            self._next += 1
+            return allocated
+
+    def _reserve_block(self):
+        """在单独的事务里预留一个号段，返回 (起始ID, 结束ID)"""
+        table = self.model.__table__
+        with self.app.app_context():
+            for _ in range(3):
+                try:
+                    with db.engine.begin() as conn:
+                        # 先执行 UPDATE 拿到写锁，之后的读取和修正都在锁内完成
+                        result = conn.execute(
+                            update(IdBlock)
+                            .where(IdBlock.name == table.name)
+                            .values(next_id=IdBlock.next_id + self.block_size)
+                        )
+                        max_id = conn.execute(select(func.max(table.c.id))).scalar() or 0
+                        if result.rowcount == 0:
+                            start = max_id + 1
+                            conn.execute(insert(IdBlock).values(
+                                name=table.name, next_id=start + self.block_size))
+                            return start, start + self.block_size
+                        end = conn.execute(
+                            select(IdBlock.next_id).where(IdBlock.name == table.name)
+                        ).scalar()
+                        start = end - self.block_size
+                        # 其他写入路径（未启用写后缓冲时）可能已经用掉了这段 ID
+                        if start <= max_id:
+                            start = max_id + 1
+                            conn.execute(
+                                update(IdBlock)
+                                .where(IdBlock.name == table.name)
+                                .values(next_id=start + self.block_size)
+                            )
+                        return start, start + self.block_size
+                except IntegrityError:
+                    # 另一个 worker 同时插入了号段行，重试即可
+                    continue
+        raise RuntimeError(f'无法为 {table.name} 预留ID号段')
+
+
+class _PendingWrite:
+    """队列中的一条待写入记录"""
+    __slots__ = ('values', 'done', 'error')
+
+    def __init__(self, values, wait):
+        self.values = values
+        self.done = threading.Event() if wait else None
+        self.error = None
+
+
+class WriteBehindQueue:
+    """进程内的写后缓冲队列，后台线程按时间或条数分组提交"""
+
+    def __init__(self, app, model, flush_interval_ms=50, max_batch=200,
+                 durability='fsync', id_block_size=64, on_flush=None):
+        """on_flush(connection, rows)：每批写入后、提交前调用，用于在同一事务里维护派生数据"""
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f'durability 只能是 {DURABILITY_MODES} 之一')
+        self.app = app
+        self.model = model
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.durability = durability
+        self.allocator = IdBlockAllocator(app, model, id_block_size)
+        self.on_flush = on_flush
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stopping = False
+        # 统计信息
+        self.flushed_rows = 0
+        self.flushed_batches = 0
+        self.failed_rows = 0
+        atexit.register(self.drain)
+
+    def submit(self, values):
+        """
+        把一条记录放入队列，返回预留的 ID。
+        'fsync' 模式下会等待记录写入数据库，写入失败时抛出原始异常。
+        """
+        if self._stopping:
+            raise RuntimeError('写后缓冲队列已关闭')
+        self._ensure_started()
+        values = dict(values)
+        if values.get('id') is None:
+            values['id'] = self.allocator.next_id()
+        item = _PendingWrite(values, wait=self.durability == 'fsync')
+        self._queue.put(item)
+        if item.done is not None:
+            item.done.wait()
+            if item.error is not None:
+                raise item.error
+        return values['id']
+
+    @property
+    def depth(self):
+        """当前排队等待写入的记录数"""
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        # gunicorn 会 fork 出多个 worker，线程不会被继承，所以按进程启动
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._run, name='submission-write-behind', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            # 在时间窗口内继续收集，直到攒够 max_batch 条
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._flush(batch)
+                    return
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch):
+        error = None
+        with self.app.app_context():
+            try:
+                rows = [item.values for item in batch]
+                db.session.execute(insert(self.model), rows)
+                if self.on_flush is not None:
+                    self.on_flush(db.session.connection(), rows)
+                db.session.commit()
+                self.flushed_rows += len(batch)
+                self.flushed_batches += 1
+            except Exception as exc:
+                db.session.rollback()
+                self.failed_rows += len(batch)
+                logger.exception('写后缓冲批量写入失败（%d 条）', len(batch))
+                error = exc
+            finally:
+                db.session.remove()
+        for item in batch:
+            if item.done is not None:
+                item.error = error
+                item.done.set()
+
+    def drain(self, timeout=10):
+        """停止接收新记录，并等待队列中剩余的记录全部写入（worker 退出时调用）"""
+        self._stopping = True
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)